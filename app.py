@@ -10,15 +10,19 @@ import numpy as np
 from pathlib import Path
 import plotly.graph_objects as go
 import plotly.express as px
-from io import BytesIO
-from collections import Counter
-from itertools import combinations
-from typing import Tuple, Optional, Dict, List
-import re
-from sklearn.cluster import KMeans
-from sklearn.preprocessing import StandardScaler
-from sklearn.ensemble import IsolationForest
-from datetime import datetime, timedelta
+import json
+from datetime import datetime
+from engine import (
+    ASSOC_MAX_BASKET, ASSOC_MIN_SUPPORT, BACKTEST_MIN_HISTORY, FORECAST_MODELS, MEMORY_BUDGET_MB,
+    SLOTTING_PAIRS, VALID_BRANDS, abc_from_partials, acquire_dataset, anomaly_model, assoc_from_pairs,
+    assoc_from_partials, association_matrix, build_neighbour_index, compute_abc, compute_anomalies,
+    compute_assoc, compute_backtest, compute_clustering, compute_geo_data, compute_global_kpis,
+    compute_itemsets, compute_neighbours, compute_sku_forecast, compute_slotting,
+    create_summary_report, current_dataset, dataset_signature, export_to_excel, filter_rows,
+    get_dataset, invalidate_dataset, list_source_months, load_dataset, neighbours_of, orders_by_id,
+    plan_load, publish_dataset, read_alerts, register_frame, reset_anomaly_baseline, score_new_orders,
+    stream_aggregates
+)
 import warnings
 warnings.filterwarnings('ignore')
 
@@ -170,653 +174,6 @@ st.markdown(f"""
     </style>
 """, unsafe_allow_html=True)
 
-# Configuration
-ENCODINGS = ['utf-8-sig', 'utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
-VALID_BRANDS = ['ER', 'OC', 'ME']
-
-# =============================================================================
-# CORE BUSINESS LOGIC - OPTIMIZED
-# =============================================================================
-
-@st.cache_data(show_spinner=False, ttl=3600, max_entries=2)
-def load_data(folder: str) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
-    """
-    Load data from Parquet files with robust error handling and memory management
-    Returns: (DataFrame, Error Message)
-    """
-    # Configuration limits to prevent crashes
-    MAX_FILE_SIZE_MB = 500  # Max 500 MB per file
-    MAX_TOTAL_ROWS = 10_000_000  # Max 10 million rows total
-    MAX_FILES = 50  # Max 50 files
-    SAMPLE_LARGE_FILES = True  # Enable sampling for large files
-    SAMPLE_SIZE = 1_000_000  # Sample size for large files
-
-    try:
-        path = Path(folder)
-        if not path.exists():
-            return None, f"⚠️ Directory not found: {folder}"
-
-        # Load Parquet files
-        files = sorted(path.glob("*.parquet"))
-        if not files:
-            return None, "⚠️ No Parquet files found in directory."
-
-        # Limit number of files
-        if len(files) > MAX_FILES:
-            st.warning(f"⚠️ Found {len(files)} files. Loading only the first {MAX_FILES} files.")
-            files = files[:MAX_FILES]
-
-        all_dfs = []
-        failed_files = []
-        skipped_files = []
-        total_rows = 0
-
-        progress_bar = st.progress(0)
-        status_text = st.empty()
-
-        for i, file in enumerate(files):
-            status_text.text(f"Chargement {file.name}... ({i+1}/{len(files)})")
-
-            try:
-                # Check file size before loading
-                file_size_mb = file.stat().st_size / (1024 * 1024)
-                if file_size_mb > MAX_FILE_SIZE_MB:
-                    skipped_files.append(f"{file.name} ({file_size_mb:.1f}MB)")
-                    continue
-
-                # Load Parquet file
-                df = pd.read_parquet(file)
-
-                # Check if we're approaching row limit
-                if total_rows + len(df) > MAX_TOTAL_ROWS:
-                    remaining_rows = MAX_TOTAL_ROWS - total_rows
-                    if remaining_rows > 0 and SAMPLE_LARGE_FILES:
-                        # Take only remaining rows
-                        df = df.sample(n=min(remaining_rows, len(df)), random_state=42)
-                        st.warning(f"⚠️ Sampling {file.name} to respect row limit")
-                    else:
-                        st.warning(f"⚠️ Row limit reached. Stopping at {i+1}/{len(files)} files.")
-                        break
-
-                # Sample large dataframes
-                if len(df) > SAMPLE_SIZE and SAMPLE_LARGE_FILES:
-                    original_size = len(df)
-                    df = df.sample(n=SAMPLE_SIZE, random_state=42)
-                    st.info(f"ℹ️ Sampling {file.name}: {original_size:,} → {SAMPLE_SIZE:,} rows")
-
-                # Clean column names
-                df.columns = df.columns.str.strip()
-
-                # Unify column names
-                col_map = {
-                    'v_Code Pays Facturation': 'Pays',
-                    'Pays de Livraison': 'Pays',
-                    'Pays Facturation': 'Pays',
-                    'Code Pays': 'Pays'
-                }
-                df.rename(columns=col_map, inplace=True)
-
-                # Add missing columns with defaults (memory efficient)
-                if 'PCB' not in df.columns:
-                    df['PCB'] = np.nan
-                if 'SPCB' not in df.columns:
-                    df['SPCB'] = np.nan
-
-                df['_Source'] = file.name
-
-                # Optimize memory usage
-                df = optimize_dataframe_memory(df)
-
-                all_dfs.append(df)
-                total_rows += len(df)
-
-            except MemoryError:
-                st.error(f"❌ Memory error loading {file.name}. Try with fewer files or enable sampling.")
-                break
-            except Exception as e:
-                failed_files.append(f"{file.name} ({str(e)[:50]})")
-                continue
-
-            progress_bar.progress((i + 1) / len(files))
-
-        progress_bar.empty()
-        status_text.empty()
-
-        if not all_dfs:
-            return None, "⚠️ Could not read any files. Check file format or size limits."
-
-        # Display warnings
-        if failed_files:
-            st.warning(f"⚠️ Could not load {len(failed_files)} file(s): {', '.join(failed_files[:3])}")
-        if skipped_files:
-            st.warning(f"⚠️ Skipped {len(skipped_files)} large file(s): {', '.join(skipped_files[:3])}")
-
-        # Concatenate with memory-efficient method
-        try:
-            combined_df = pd.concat(all_dfs, ignore_index=True, sort=False, copy=False)
-
-            # Clear individual dataframes from memory
-            del all_dfs
-
-            st.success(f"✅ {len(files)} fichier(s) Parquet chargé(s) - {total_rows:,} lignes au total")
-
-            return combined_df, None
-
-        except MemoryError:
-            return None, "⚠️ Memory error during data concatenation. Reduce data size or enable sampling."
-
-    except Exception as e:
-        return None, f"⚠️ Critical error: {str(e)}"
-
-
-def optimize_dataframe_memory(df: pd.DataFrame) -> pd.DataFrame:
-    """
-    Optimize DataFrame memory usage by downcasting numeric types
-    """
-    try:
-        for col in df.columns:
-            col_type = df[col].dtype
-
-            # Optimize integer columns
-            if col_type == 'int64':
-                df[col] = pd.to_numeric(df[col], downcast='integer')
-
-            # Optimize float columns
-            elif col_type == 'float64':
-                df[col] = pd.to_numeric(df[col], downcast='float')
-
-            # Convert object columns with few unique values to category
-            elif col_type == 'object':
-                num_unique = df[col].nunique()
-                num_total = len(df[col])
-                if num_unique / num_total < 0.5:  # Less than 50% unique values
-                    df[col] = df[col].astype('category')
-
-        return df
-    except Exception:
-        # If optimization fails, return original df
-        return df
-
-def clean_data(df: pd.DataFrame) -> pd.DataFrame:
-    """
-    Comprehensive data cleaning and validation with memory optimization
-    """
-    try:
-        original_count = len(df)
-
-        # Verify minimum required columns exist
-        required_cols = ['Article', 'Nbre Unités']
-        missing_cols = [col for col in required_cols if col not in df.columns]
-        if missing_cols:
-            st.error(f"❌ Missing required columns: {', '.join(missing_cols)}")
-            return pd.DataFrame()
-
-        # Clean Article codes (memory efficient)
-        with st.spinner("Nettoyage des codes articles..."):
-            df['Article'] = df['Article'].astype(str).str.upper().str.strip()
-            mask = (
-                df['Article'].notna() &
-                (df['Article'] != '') &
-                (df['Article'] != 'NAN') &
-                (~df['Article'].str.contains('TOTAL|SOMME|ARTICLE|UNDEFINED', case=False, na=False, regex=True))
-            )
-            df = df[mask]
-
-        # Convert numeric columns efficiently
-        with st.spinner("Conversion des colonnes numériques..."):
-            numeric_cols = ['Nbre Unités', 'Quantité préparée', 'Nbre Colis', 'PCB', 'SPCB']
-            for col in numeric_cols:
-                if col in df.columns:
-                    # More efficient conversion
-                    df[col] = pd.to_numeric(
-                        df[col].astype(str).str.replace(',', '.'),
-                        errors='coerce'
-                    ).fillna(0).astype('float32')  # Use float32 instead of float64
-
-        # Handle dates intelligently
-        with st.spinner("Traitement des dates..."):
-            df = process_dates(df)
-
-        # Clean and validate brands
-        with st.spinner("Validation des marques..."):
-            if 'Marque' in df.columns:
-                df['Marque'] = df['Marque'].astype(str).str.upper().str.strip()
-                df = df[df['Marque'].isin(VALID_BRANDS)]
-            else:
-                st.warning("⚠️ 'Marque' column not found. Creating default brand.")
-                df['Marque'] = 'ER'
-
-        # Clean operation numbers
-        if 'No Op' in df.columns:
-            df['No Op'] = df['No Op'].astype(str).str.strip()
-            df = df[df['No Op'] != '']
-
-        # Remove duplicates efficiently
-        with st.spinner("Suppression des doublons..."):
-            df = df.drop_duplicates(keep='first')
-
-        # Filter out invalid data
-        df = df[df['Nbre Unités'] >= 0]
-
-        # Reset index to optimize memory
-        df.reset_index(drop=True, inplace=True)
-
-        cleaned_count = len(df)
-
-        if cleaned_count == 0:
-            st.error("❌ No valid data remaining after cleaning!")
-            return pd.DataFrame()
-
-        if cleaned_count < original_count * 0.5:
-            st.warning(f"⚠️ Data cleaning removed {original_count - cleaned_count:,} rows ({(1-cleaned_count/original_count)*100:.1f}%)")
-        else:
-            st.info(f"✅ Data cleaned: {cleaned_count:,} rows kept from {original_count:,}")
-
-        return df
-
-    except MemoryError:
-        st.error("❌ Memory error during data cleaning. Try loading less data.")
-        return pd.DataFrame()
-    except Exception as e:
-        st.error(f"❌ Error during data cleaning: {str(e)}")
-        return pd.DataFrame()
-
-def process_dates(df: pd.DataFrame) -> pd.DataFrame:
-    """
-    Intelligent date processing with fallbacks and error handling
-    """
-    try:
-        if 'Date Expedition Colis' in df.columns:
-            # Try to parse existing dates
-            df['Date'] = pd.to_datetime(
-                df['Date Expedition Colis'],
-                dayfirst=True,
-                errors='coerce'
-            )
-
-            # Fallback for failed dates
-            mask_na = df['Date'].isna()
-            if mask_na.any():
-                # Extract from filename (safer approach)
-                def extract_date_from_filename(filename):
-                    try:
-                        match = re.search(r'(\d{4}-\d{2})', str(filename))
-                        return match.group(1) if match else None
-                    except Exception:
-                        return None
-
-                df.loc[mask_na, 'Mois_Str'] = df.loc[mask_na, '_Source'].apply(extract_date_from_filename)
-
-                # Only process rows where we found a date pattern
-                valid_month_mask = mask_na & df['Mois_Str'].notna()
-                if valid_month_mask.any():
-                    df.loc[valid_month_mask, 'Date'] = pd.to_datetime(
-                        df.loc[valid_month_mask, 'Mois_Str'] + '-01',
-                        errors='coerce'
-                    )
-        else:
-            # Full fallback: extract from filename
-            def safe_extract_date(filename):
-                try:
-                    match = re.search(r'(\d{4}-\d{2})', str(filename))
-                    return match.group(1) if match else '2025-01'
-                except Exception:
-                    return '2025-01'
-
-            df['Mois_Str'] = df['_Source'].apply(safe_extract_date)
-            df['Date'] = pd.to_datetime(df['Mois_Str'] + '-01', errors='coerce')
-
-        # Final fallback for any remaining NaT
-        df['Date'] = df['Date'].fillna(pd.Timestamp.now())
-
-        # Create derived date columns efficiently
-        df['Mois'] = df['Date'].dt.strftime('%Y-%m')
-        df['Year'] = df['Date'].dt.year.astype('int16')  # Use int16 for year
-        df['Month'] = df['Date'].dt.month.astype('int8')  # Use int8 for month
-        df['DayOfWeek'] = df['Date'].dt.day_name().astype('category')  # Category for day names
-        df['Week'] = df['Date'].dt.isocalendar().week.astype('int8')  # Use int8 for week
-
-        return df
-
-    except Exception as e:
-        st.warning(f"⚠️ Error processing dates: {str(e)}. Using default dates.")
-        # If all else fails, use current date
-        df['Date'] = pd.Timestamp.now()
-        df['Mois'] = df['Date'].dt.strftime('%Y-%m')
-        df['Year'] = df['Date'].dt.year.astype('int16')
-        df['Month'] = df['Date'].dt.month.astype('int8')
-        df['DayOfWeek'] = df['Date'].dt.day_name().astype('category')
-        df['Week'] = df['Date'].dt.isocalendar().week.astype('int8')
-        return df
-
-@st.cache_data(show_spinner=False)
-def compute_abc(df: pd.DataFrame, metric: str) -> pd.DataFrame:
-    """
-    ABC Analysis with Pareto principle
-    """
-    try:
-        agg = df.groupby('Article')[metric].sum().reset_index()
-        agg = agg.sort_values(metric, ascending=False)
-
-        total = agg[metric].sum()
-        if total == 0:
-            return agg
-
-        agg['Pct'] = (agg[metric] / total) * 100
-        agg['Cumul'] = agg['Pct'].cumsum()
-        agg['Classe'] = np.select(
-            [agg['Cumul'] <= 80, agg['Cumul'] <= 95],
-            ['A', 'B'],
-            default='C'
-        )
-
-        return agg
-    except Exception as e:
-        st.error(f"Error in ABC calculation: {str(e)}")
-        return pd.DataFrame()
-
-@st.cache_data(show_spinner=False)
-def compute_assoc(df: pd.DataFrame, min_pct: float) -> Tuple[Optional[pd.DataFrame], int]:
-    """
-    Market Basket Analysis - Product associations
-    """
-    try:
-        if 'No Op' not in df.columns:
-            return None, 0
-
-        valid = df[df['Nbre Unités'] > 0][['No Op', 'Article']].drop_duplicates()
-        baskets = valid.groupby('No Op')['Article'].apply(list)
-        baskets = [b for b in baskets if len(b) > 1]
-
-        n = len(baskets)
-        if n == 0:
-            return None, 0
-
-        min_sup = max(2, n * (min_pct / 100))
-        pairs = Counter()
-
-        for basket in baskets:
-            basket_sorted = sorted(basket)
-            pairs.update(combinations(basket_sorted, 2))
-
-        results = [
-            {
-                'Produit A': a,
-                'Produit B': b,
-                'Fréquence': c,
-                'Support': round((c/n)*100, 2)
-            }
-            for (a, b), c in pairs.most_common(100)
-            if c >= min_sup
-        ]
-
-        return pd.DataFrame(results) if results else None, n
-
-    except Exception as e:
-        st.error(f"Error in association analysis: {str(e)}")
-        return None, 0
-
-@st.cache_data(show_spinner=False)
-def compute_forecast(df: pd.DataFrame, metric: str, window: int = 7, horizon: int = 14) -> Tuple[pd.DataFrame, pd.DataFrame]:
-    """
-    Time series forecasting with moving average
-    """
-    try:
-        daily = df.groupby('Date')[metric].sum().reset_index().sort_values('Date')
-        daily = daily.set_index('Date')
-
-        # Fill missing dates
-        idx = pd.date_range(daily.index.min(), daily.index.max(), freq='D')
-        daily = daily.reindex(idx, fill_value=0)
-        daily.columns = [metric]
-
-        # Moving averages
-        daily['MA_7'] = daily[metric].rolling(window=window, min_periods=1).mean()
-        daily['MA_30'] = daily[metric].rolling(window=30, min_periods=1).mean()
-
-        # Forecast
-        last_ma = daily['MA_7'].iloc[-7:].mean()
-        future_dates = pd.date_range(
-            daily.index.max() + pd.Timedelta(days=1),
-            periods=horizon,
-            freq='D'
-        )
-        forecast = pd.DataFrame({
-            'Date': future_dates,
-            'Forecast': [last_ma] * horizon
-        }).set_index('Date')
-
-        return daily, forecast
-
-    except Exception as e:
-        st.error(f"Error in forecasting: {str(e)}")
-        return pd.DataFrame(), pd.DataFrame()
-
-@st.cache_data(show_spinner=False)
-def compute_anomalies(df: pd.DataFrame) -> pd.DataFrame:
-    """
-    Anomaly detection using Isolation Forest
-    """
-    try:
-        if 'No Op' not in df.columns:
-            return pd.DataFrame()
-
-        orders = df.groupby('No Op').agg({
-            'Nbre Unités': 'sum',
-            'Article': 'count',
-            'Nbre Colis': 'sum'
-        }).reset_index()
-
-        orders.columns = ['No Op', 'Volume', 'Lignes', 'Colis']
-
-        # Only run if we have enough data
-        if len(orders) < 10:
-            return pd.DataFrame()
-
-        # Isolation Forest
-        iso = IsolationForest(
-            contamination=0.02,
-            random_state=42,
-            n_estimators=100
-        )
-        orders['Anomaly'] = iso.fit_predict(orders[['Volume', 'Lignes', 'Colis']])
-
-        anomalies = orders[orders['Anomaly'] == -1].copy()
-
-        if len(anomalies) == 0:
-            return pd.DataFrame()
-
-        # Severity score
-        anomalies['Score'] = (
-            (anomalies['Volume'] / orders['Volume'].mean()) +
-            (anomalies['Lignes'] / orders['Lignes'].mean())
-        )
-
-        return anomalies.sort_values('Score', ascending=False)
-
-    except Exception as e:
-        st.error(f"Error in anomaly detection: {str(e)}")
-        return pd.DataFrame()
-
-@st.cache_data(show_spinner=False)
-def compute_clustering(df: pd.DataFrame) -> pd.DataFrame:
-    """
-    Product clustering for strategic placement
-    """
-    try:
-        stats = df.groupby('Article').agg({
-            'Nbre Unités': 'sum',
-            'No Op': 'nunique'
-        }).reset_index()
-
-        stats.columns = ['Article', 'Volume', 'Frequence']
-
-        if len(stats) < 3:
-            return stats
-
-        # Normalization
-        scaler = StandardScaler()
-        X = scaler.fit_transform(stats[['Volume', 'Frequence']])
-
-        # K-Means clustering
-        n_clusters = min(3, len(stats))
-        kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
-        stats['Cluster'] = kmeans.fit_predict(X)
-
-        # Label clusters
-        cluster_avg = stats.groupby('Cluster')['Frequence'].mean().sort_values(ascending=False)
-        mapping = {old: new for new, old in enumerate(cluster_avg.index)}
-
-        labels = {
-            0: '🥇 Gold (Hot Zone)',
-            1: '🥈 Silver (Warm Zone)',
-            2: '🥉 Bronze (Cold Zone)'
-        }
-
-        stats['Cluster_Label'] = stats['Cluster'].map(mapping).map(labels)
-
-        return stats
-
-    except Exception as e:
-        st.error(f"Error in clustering: {str(e)}")
-        return pd.DataFrame()
-
-@st.cache_data(show_spinner=False)
-def compute_global_kpis(df: pd.DataFrame) -> Dict:
-    """
-    Global KPIs for operational overview
-    """
-    try:
-        kpis = {}
-
-        # Order profile
-        lines_per_order = df.groupby('No Op')['Article'].count()
-        mono_orders = (lines_per_order == 1).sum()
-        total_orders = len(lines_per_order)
-
-        kpis['pct_mono'] = (mono_orders / total_orders * 100) if total_orders > 0 else 0
-        kpis['total_orders'] = total_orders
-        kpis['mono_orders'] = mono_orders
-
-        # Density
-        order_stats = df.groupby('No Op').agg({
-            'Nbre Unités': 'sum',
-            'Nbre Colis': 'sum'
-        })
-
-        total_units = order_stats['Nbre Unités'].sum()
-        total_colis = order_stats['Nbre Colis'].sum()
-
-        kpis['density'] = (total_units / total_colis) if total_colis > 0 else 0
-        kpis['lines_per_order'] = lines_per_order
-        kpis['order_stats'] = order_stats
-        kpis['avg_lines'] = lines_per_order.mean()
-        kpis['total_units'] = total_units
-        kpis['total_colis'] = total_colis
-
-        return kpis
-
-    except Exception as e:
-        st.error(f"Error computing KPIs: {str(e)}")
-        return {}
-
-@st.cache_data(show_spinner=False)
-def compute_geo_data(df: pd.DataFrame) -> pd.DataFrame:
-    """
-    Geographic analysis
-    """
-    try:
-        if 'Pays' not in df.columns:
-            return pd.DataFrame()
-
-        geo = df.groupby('Pays').agg({
-            'Nbre Unités': 'sum',
-            'No Op': 'nunique',
-            'Nbre Colis': 'sum'
-        }).reset_index()
-
-        geo.columns = ['Pays', 'Unités', 'Commandes', 'Colis']
-        geo = geo.sort_values('Unités', ascending=False)
-
-        return geo
-
-    except Exception as e:
-        st.error(f"Error in geo analysis: {str(e)}")
-        return pd.DataFrame()
-
-@st.cache_data(show_spinner=False)
-def compute_quality_metrics(df: pd.DataFrame) -> Tuple[float, pd.DataFrame]:
-    """
-    Quality and service level metrics
-    """
-    try:
-        if 'Quantité préparée' in df.columns and df['Quantité préparée'].sum() > 0:
-            total_ordered = df['Nbre Unités'].sum()
-            total_prepared = df['Quantité préparée'].sum()
-            service_rate = (total_prepared / total_ordered * 100) if total_ordered > 0 else 100
-
-            # Stockouts
-            cuts = df[df['Quantité préparée'] < df['Nbre Unités']].copy()
-            cuts['Manquant'] = cuts['Nbre Unités'] - cuts['Quantité préparée']
-
-            top_cuts = cuts.groupby('Article')['Manquant'].sum().reset_index()
-            top_cuts = top_cuts.sort_values('Manquant', ascending=False).head(20)
-        else:
-            service_rate = 98.5
-            top_cuts = pd.DataFrame()
-
-        return service_rate, top_cuts
-
-    except Exception as e:
-        st.error(f"Error in quality metrics: {str(e)}")
-        return 0.0, pd.DataFrame()
-
-# =============================================================================
-# EXPORT UTILITIES
-# =============================================================================
-
-def export_to_excel(dataframes: Dict[str, pd.DataFrame], filename: str) -> BytesIO:
-    """
-    Export multiple dataframes to Excel with formatting
-    """
-    output = BytesIO()
-
-    with pd.ExcelWriter(output, engine='openpyxl') as writer:
-        for sheet_name, df in dataframes.items():
-            df.to_excel(writer, sheet_name=sheet_name[:31], index=False)
-
-    output.seek(0)
-    return output
-
-def create_summary_report(df: pd.DataFrame, kpis: Dict) -> str:
-    """
-    Generate executive summary report
-    """
-    report = f"""
-# WMS Analytics - Executive Summary
-Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}
-
-## Key Performance Indicators
-
-### Volume Metrics
-- Total Units Processed: {kpis.get('total_units', 0):,.0f}
-- Total Orders: {kpis.get('total_orders', 0):,.0f}
-- Total Packages: {kpis.get('total_colis', 0):,.0f}
-
-### Operational Efficiency
-- Package Density: {kpis.get('density', 0):.2f} units/package
-- Average Lines per Order: {kpis.get('avg_lines', 0):.2f}
-- Single-Line Orders: {kpis.get('pct_mono', 0):.1f}%
-
-### Period Analyzed
-- Date Range: {df['Date'].min().strftime('%Y-%m-%d')} to {df['Date'].max().strftime('%Y-%m-%d')}
-- Total Days: {(df['Date'].max() - df['Date'].min()).days}
-
----
-Report generated by WMS Analytics Pro v6.0
-"""
-    return report
-
 # =============================================================================
 # SESSION STATE MANAGEMENT
 # =============================================================================
@@ -915,19 +272,93 @@ with st.sidebar:
             value="compressed_dataset"
         )
 
+        load_months = st.multiselect(
+            "Mois à charger",
+            list_source_months(folder),
+            default=[],
+            help="Vide = tous les mois. Seules les lignes des mois choisis sont lues depuis les fichiers Parquet."
+        )
+
+        rebuild_cache = st.checkbox(
+            "Reconstruire le cache",
+            value=False,
+            help="Ignore le cache disque et relit tous les fichiers Parquet"
+        )
+
+        streaming = st.checkbox(
+            "Mode streaming (sans échantillonnage)",
+            value=False,
+            help="KPIs, ABC et associations calculés sur l'historique complet, lot par lot, en mémoire bornée"
+        )
+
+        budget_mb = st.number_input(
+            "Budget mémoire (Mo)",
+            min_value=256,
+            max_value=262144,
+            value=MEMORY_BUDGET_MB,
+            step=256,
+            help="Le plan de chargement est choisi à partir des métadonnées Parquet pour tenir dans ce budget"
+        )
+
         if st.button("🔄 Actualiser les Données", type="primary", width='stretch'):
             with st.spinner("Chargement des données..."):
-                st.cache_data.clear()
-                raw, error = load_data(folder)
+                load_months = tuple(load_months) or None
+                plan = plan_load(folder, budget_mb, load_months, streaming=streaming)
+                st.session_state['load_plan'] = plan
+                source = str(Path(folder).resolve())
+                signature = dataset_signature(folder, load_months, plan)
+                if rebuild_cache:
+                    invalidate_dataset(source)
+                    reset_anomaly_baseline(source)
+
+                # Another session may already hold this exact dataset in memory
+                version = current_dataset(source, signature)
+                handle = acquire_dataset(version) if version else None
+                error = None
+
+                if handle is None:
+                    st.cache_data.clear()
+                    data, aggregates, error = load_dataset(folder, months=load_months, force=rebuild_cache, plan=plan)
+
+                    if not error and plan['strategy'] == 'streaming':
+                        aggregates, error = stream_aggregates(folder, months=load_months, force=rebuild_cache)
+
+                    if not error:
+                        handle = publish_dataset(source, signature, data, aggregates, {
+                            'streaming': plan['strategy'] == 'streaming',
+                            'plan': plan
+                        })
+                        # Orders of newly landed files are scored against the baseline, without refit
+                        if aggregates:
+                            score_new_orders(source, aggregates)
 
                 if error:
                     st.error(error)
                 else:
-                    st.session_state['data'] = clean_data(raw)
+                    previous = st.session_state.get('dataset')
+                    if previous is not None:
+                        previous.release()
+                    st.session_state['dataset'] = handle
                     st.session_state['data_loaded'] = True
-                    st.success(f"✅ {len(st.session_state['data']):,} enregistrements chargés")
+                    st.success(f"✅ {len(get_dataset(handle)['data']):,} enregistrements chargés")
                     st.rerun()
 
+        plan = st.session_state.get('load_plan')
+        if plan:
+            labels = {
+                'full': 'Chargement complet',
+                'categorical': 'Décodage catégoriel',
+                'pruned': 'Colonnes essentielles',
+                'streaming': 'Streaming'
+            }
+            estimate = plan['estimates_mb'].get(plan['strategy'], plan['estimates_mb']['pruned'])
+            st.caption(
+                f"🧮 Plan : **{labels[plan['strategy']]}** - {plan['rows']:,} lignes, "
+                f"~{estimate:,.0f} Mo estimés / {plan['budget_mb']:,.0f} Mo"
+            )
+            if plan['sample_fraction']:
+                st.caption(f"Lignes en mémoire échantillonnées à {plan['sample_fraction']:.0%}")
+
     st.markdown("---")
 
     # User info
@@ -945,6 +376,8 @@ with st.sidebar:
     if st.button("🚪 Déconnexion", width='stretch'):
         st.session_state['authenticated'] = False
         st.session_state['data_loaded'] = False
+        if st.session_state.get('dataset') is not None:
+            st.session_state.pop('dataset').release()
         st.rerun()
 
 # =============================================================================
@@ -984,7 +417,23 @@ if not st.session_state.get('data_loaded', False):
 
     st.stop()
 
-df = st.session_state['data']
+# Shared dataset: follow the current version of the source once another session refreshed it
+handle = st.session_state['dataset']
+dataset = get_dataset(handle)
+latest = current_dataset(dataset['meta']['source']) if dataset else None
+newer = acquire_dataset(latest) if latest and latest != handle.version else None
+if newer is not None:
+    handle.release()
+    handle = st.session_state['dataset'] = newer
+    dataset = get_dataset(handle)
+    st.toast("🔄 Données mises à jour par une autre session")
+if dataset is None:
+    st.session_state['data_loaded'] = False
+    st.warning("⚠️ Le jeu de données a été invalidé. Veuillez recharger les données.")
+    st.stop()
+
+df = dataset['data']
+index = dataset['index']
 metric = "Nbre Unités"
 
 # Global Filters
@@ -992,7 +441,7 @@ with st.expander("🔎 Filtres & Paramètres", expanded=False):
     col_f1, col_f2, col_f3 = st.columns(3)
 
     with col_f1:
-        months = sorted(df['Mois'].unique())
+        months = list(index['months'])
         sel_months = st.multiselect("📅 Période", months, default=months)
 
     with col_f2:
@@ -1002,25 +451,48 @@ with st.expander("🔎 Filtres & Paramètres", expanded=False):
         try:
             date_range = st.date_input(
                 "📆 Plage de Dates",
-                value=(df['Date'].min(), df['Date'].max()),
-                min_value=df['Date'].min(),
-                max_value=df['Date'].max()
+                value=(index['date_min'], index['date_max']),
+                min_value=index['date_min'],
+                max_value=index['date_max']
             )
         except Exception:
             date_range = []
 
-# Apply filters
-mask = pd.Series(True, index=df.index)
-if sel_months:
-    mask &= df['Mois'].isin(sel_months)
-if sel_brands:
-    mask &= df['Marque'].isin(sel_brands)
-if isinstance(date_range, tuple) and len(date_range) == 2:
-    mask &= (df['Date'] >= pd.Timestamp(date_range[0])) & (df['Date'] <= pd.Timestamp(date_range[1]))
-elif hasattr(date_range, '__len__') and len(date_range) == 2:
-    mask &= (df['Date'] >= pd.Timestamp(date_range[0])) & (df['Date'] <= pd.Timestamp(date_range[1]))
-
-df_f = df[mask]
+# Apply filters through the filter index: the shared frame itself, a slice of it or a row selection
+filters = {
+    'months': sel_months,
+    'brands': sel_brands,
+    'date_range': tuple(date_range) if hasattr(date_range, '__len__') and len(date_range) == 2 else None
+}
+df_f = filter_rows(df, index, **filters)
+
+# Same filters on the cube: charts aggregate its cells instead of the lines
+cube = dataset['cube']
+orders_f = filter_rows(dataset['orders'], dataset['orders_index'], **filters)
+cells_f = filter_rows(cube['cells'], cube['cells_index'], **filters)
+members_f = filter_rows(cube['members'], cube['members_index'], **filters)
+
+# compute_* caches key df_f by dataset version and filter signature instead of hashing its content
+filter_signature = json.dumps({
+    'months': sorted(map(str, sel_months)),
+    'brands': sorted(sel_brands),
+    'dates': [str(d) for d in date_range] if hasattr(date_range, '__len__') else str(date_range)
+})
+register_frame(df_f, f"{handle.version}|{filter_signature}")
+register_frame(cells_f, f"{handle.version}|cells|{filter_signature}")
+register_frame(members_f, f"{handle.version}|members|{filter_signature}")
+register_frame(orders_f, f"{handle.version}|orders|{filter_signature}")
+
+# Whole-dataset aggregates maintained at load time apply when no filter narrows the selection
+aggregates = dataset['aggregates'] if df_f is df else None
+if aggregates:
+    register_frame(aggregates['orders'], f"{handle.version}|aggregates")
+
+if dataset['meta']['streaming'] and dataset['meta']['plan']['sample_fraction']:
+    st.caption(
+        "ℹ️ Mode streaming : KPIs, ABC et associations sont exacts sur tout l'historique, filtres compris ; "
+        f"les analyses ligne à ligne portent sur un échantillon de {dataset['meta']['plan']['sample_fraction']:.0%} des lignes."
+    )
 
 if len(df_f) == 0:
     st.warning("⚠️ Aucune donnée ne correspond aux filtres sélectionnés. Veuillez ajuster.")
@@ -1035,7 +507,7 @@ if page == "🏠 Tableau de Bord Exécutif":
     st.markdown("Vue d'ensemble opérationnelle en temps réel et indicateurs clés de performance")
 
     # Top KPIs
-    kpis = compute_global_kpis(df_f)
+    kpis = compute_global_kpis(aggregates['orders'] if aggregates else orders_f)
 
     col1, col2, col3, col4, col5 = st.columns(5)
 
@@ -1086,7 +558,7 @@ if page == "🏠 Tableau de Bord Exécutif":
         st.markdown("### 📈 Tendance du Volume Quotidien")
         st.caption("💡 **Comment lire ce graphique** : Chaque point représente le volume total d'unités expédiées par jour. Les pics indiquent les jours de forte activité.")
         
-        daily_trend = df_f.groupby('Date')[metric].sum().reset_index()
+        daily_trend = cells_f.groupby('Date')[metric].sum().reset_index()
 
         if not daily_trend.empty:
             fig_daily = px.area(
@@ -1125,7 +597,7 @@ if page == "🏠 Tableau de Bord Exécutif":
         st.markdown("### 🏢 Volume par Marque")
         st.caption("💡 **Comment lire ce graphique** : Chaque segment représente la part de volume d'une marque. Plus le segment est grand, plus la marque est importante.")
         
-        brand_vol = df_f.groupby('Marque')[metric].sum().reset_index()
+        brand_vol = cells_f.groupby('Marque', observed=True)[metric].sum().reset_index()
 
         if not brand_vol.empty:
             fig_brand = px.pie(
@@ -1151,19 +623,16 @@ if page == "🏠 Tableau de Bord Exécutif":
     st.markdown("### 📅 Schéma d'Activité Hebdomadaire")
     st.caption("💡 **Comment lire ce graphique** : Chaque barre représente le volume total pour un jour de la semaine. Identifiez les jours les plus chargés pour optimiser les ressources.")
 
-    days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-    days_fr = ['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi', 'Dimanche']
-    weekly = df_f.groupby('DayOfWeek')[metric].sum().reindex(days_order, fill_value=0).reset_index()
-    weekly['DayOfWeek_FR'] = weekly['DayOfWeek'].map(dict(zip(days_order, days_fr)))
+    weekly = cells_f.groupby('Jour', observed=False)[metric].sum().reset_index()
 
     fig_week = px.bar(
         weekly,
-        x='DayOfWeek_FR',
+        x='Jour',
         y=metric,
         title="Volume Moyen par Jour de la Semaine",
         color=metric,
         color_continuous_scale='Blues',
-        labels={'DayOfWeek_FR': 'Jour', metric: 'Volume (Unités)'}
+        labels={'Jour': 'Jour', metric: 'Volume (Unités)'}
     )
     fig_week.update_layout(
         template='plotly_white',
@@ -1176,7 +645,7 @@ if page == "🏠 Tableau de Bord Exécutif":
     # Analyse du jour le plus chargé
     if len(weekly) > 0:
         busiest_day_idx = weekly[metric].idxmax()
-        busiest_day = weekly.loc[busiest_day_idx, 'DayOfWeek_FR']
+        busiest_day = weekly.loc[busiest_day_idx, 'Jour']
         busiest_vol = weekly.loc[busiest_day_idx, metric]
         st.info(f"📊 **Analyse** : Le **{busiest_day}** est le jour le plus chargé avec **{busiest_vol:,.0f} unités** en moyenne.")
 
@@ -1184,7 +653,7 @@ if page == "🏠 Tableau de Bord Exécutif":
     st.markdown("### 🏆 Top 20 Produits")
     st.caption("💡 **Comment lire ce graphique** : Les produits sont classés par volume décroissant. Les produits en haut génèrent le plus de volume et méritent une attention particulière.")
     
-    top_products = df_f.groupby('Article')[metric].sum().reset_index()
+    top_products = cells_f.groupby('Article', observed=True)[metric].sum().reset_index()
     top_products = top_products.sort_values(metric, ascending=False).head(20)
 
     fig_top = px.bar(
@@ -1206,7 +675,7 @@ if page == "🏠 Tableau de Bord Exécutif":
     
     if len(top_products) > 0:
         top_3_vol = top_products.head(3)[metric].sum()
-        total_vol = df_f[metric].sum()
+        total_vol = cells_f[metric].sum()
         st.info(f"📊 **Analyse** : Les **3 premiers produits** représentent **{(top_3_vol/total_vol*100):.1f}%** du volume total. Focus sur ces produits pour maximiser l'efficacité.")
 
 # =============================================================================
@@ -1229,7 +698,7 @@ elif page == "⚙️ Excellence Opérationnelle":
         st.markdown("### 📦 Caractéristiques des Commandes")
         st.caption("💡 **Vue d'ensemble** : Analysez la complexité et la structure de vos commandes pour optimiser les processus de picking.")
 
-        kpis = compute_global_kpis(df_f)
+        kpis = compute_global_kpis(aggregates['orders'] if aggregates else orders_f)
 
         col_k1, col_k2, col_k3, col_k4 = st.columns(4)
 
@@ -1255,7 +724,7 @@ elif page == "⚙️ Excellence Opérationnelle":
             )
 
         with col_k4:
-            median_lines = kpis.get('lines_per_order', pd.Series([0])).median()
+            median_lines = kpis.get('median_lines', 0)
             st.metric(
                 "Médiane Lignes/Cmd",
                 f"{median_lines:.0f}",
@@ -1295,9 +764,10 @@ elif page == "⚙️ Excellence Opérationnelle":
             st.caption("💡 **Comment lire** : L'histogramme montre combien de commandes ont 1, 2, 3... lignes. Les barres les plus hautes indiquent les configurations les plus fréquentes.")
             
             # Lines per order distribution
-            if 'lines_per_order' in kpis:
+            lines_per_order = orders_by_id(aggregates['orders'] if aggregates else orders_f)['Lignes']
+            if len(lines_per_order) > 0:
                 fig_dist = px.histogram(
-                    kpis['lines_per_order'],
+                    lines_per_order,
                     nbins=30,
                     title="Fréquence des Lignes/Commande",
                     color_discrete_sequence=['#f59e0b'],
@@ -1314,29 +784,9 @@ elif page == "⚙️ Excellence Opérationnelle":
         st.markdown("### 🔄 Modes de Picking")
         st.caption("💡 **Comment lire** : Ce graphique montre la répartition du volume par mode de préparation. Identifiez le mode dominant pour optimiser vos processus.")
 
-        # Define picking mode
-        df_picking = df_f.copy()
-
-        def categorize_mode(row):
-            try:
-                units = row['Nbre Unités']
-                pcb = row['PCB'] if 'PCB' in row.index and pd.notna(row['PCB']) else 0
-                spcb = row['SPCB'] if 'SPCB' in row.index and pd.notna(row['SPCB']) else 0
-
-                if pcb > 0 and units >= pcb and units % pcb == 0:
-                    return 'Colis Complet (PCB)'
-                elif spcb > 0 and units >= spcb and units % spcb == 0:
-                    return 'Sous-Colis (SPCB)'
-                elif units > 10:
-                    return 'Bulk (>10 unités)'
-                else:
-                    return 'Picking Détail'
-            except Exception:
-                return 'Picking Détail'
-
-        df_picking['Picking_Mode'] = df_picking.apply(categorize_mode, axis=1)
-
-        mode_stats = df_picking.groupby('Picking_Mode')[metric].sum().reset_index()
+        # Picking mode is a cube dimension
+        mode_volume = cells_f.groupby('Mode Picking', observed=True)[metric].sum()
+        mode_stats = pd.DataFrame({'Picking_Mode': mode_volume.index.astype(str), metric: mode_volume.to_numpy()})
         mode_stats = mode_stats.sort_values(metric, ascending=False)
 
         fig_mode = px.bar(
@@ -1372,13 +822,9 @@ elif page == "⚙️ Excellence Opérationnelle":
         st.caption("💡 **Comment lire** : Chaque cellule représente le volume pour un jour spécifique d'une semaine. Les cellules bleu foncé indiquent une forte activité. Identifiez les patterns récurrents.")
         
         # Heatmap
-        heatmap_data = df_f.groupby(['Week', 'DayOfWeek'])[metric].sum().reset_index()
-        heatmap_pivot = heatmap_data.pivot(index='DayOfWeek', columns='Week', values=metric)
-
-        days_order = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
-        days_fr = ['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi', 'Dimanche']
-        heatmap_pivot = heatmap_pivot.reindex(days_order, fill_value=0)
-        heatmap_pivot.index = days_fr
+        heatmap_data = cells_f.groupby(['Week', 'Jour'], observed=False)[metric].sum().reset_index()
+        heatmap_pivot = heatmap_data.pivot(index='Jour', columns='Week', values=metric)
+        heatmap_pivot.index = heatmap_pivot.index.astype(str)
 
         fig_heat = px.imshow(
             heatmap_pivot,
@@ -1396,7 +842,7 @@ elif page == "⚙️ Excellence Opérationnelle":
         st.caption("💡 **Comment lire** : La courbe montre l'évolution du volume mois par mois. Une pente montante indique une croissance, descendante une baisse.")
         
         # Monthly trend
-        monthly = df_f.groupby('Mois')[metric].sum().reset_index()
+        monthly = cells_f.groupby('Mois', observed=True)[metric].sum().reset_index()
 
         fig_monthly = px.line(
             monthly,
@@ -1426,7 +872,7 @@ elif page == "⚙️ Excellence Opérationnelle":
         st.markdown("### 🌍 Distribution Géographique")
         st.caption("💡 **Vue d'ensemble** : Visualisez la répartition mondiale de vos expéditions pour optimiser la logistique.")
 
-        geo_df = compute_geo_data(df_f)
+        geo_df = compute_geo_data(cells_f, members_f)
 
         if not geo_df.empty:
             col_map, col_table = st.columns([2, 1])
@@ -1487,7 +933,7 @@ elif page == "📊 Analyse ABC":
     st.markdown("# 📊 Analyse ABC")
     st.markdown("Classification stratégique des produits pour un stockage optimisé")
 
-    abc_df = compute_abc(df_f, metric)
+    abc_df = abc_from_partials(aggregates['articles'], metric) if aggregates else compute_abc(cells_f, metric)
 
     if abc_df.empty:
         st.warning("⚠️ Aucune donnée disponible pour l'analyse ABC")
@@ -1637,7 +1083,7 @@ elif page == "🔗 Associations Produits":
     with st.expander("⚙️ Paramètres d'Analyse", expanded=False):
         min_support = st.slider(
             "Support Minimum (%)",
-            min_value=0.1,
+            min_value=ASSOC_MIN_SUPPORT,
             max_value=10.0,
             value=1.0,
             step=0.1,
@@ -1645,7 +1091,16 @@ elif page == "🔗 Associations Produits":
         )
 
     with st.spinner("Analyse des associations de produits..."):
-        assoc_df, total_baskets = compute_assoc(df_f, min_support) # Changed threshold to min_support
+        if aggregates:
+            assoc_df, total_baskets = assoc_from_pairs(aggregates['pairs'], aggregates['baskets'], min_support, aggregates['items'])
+        elif dataset['pairs']:
+            assoc_df, total_baskets = assoc_from_partials(dataset['pairs'], min_support, **filters)
+        else:
+            assoc_df, total_baskets = compute_assoc(df_f, min_support) # Changed threshold to min_support
+        # Itemsets are mined once per filter selection at the slider floor; the threshold only filters them
+        itemsets_df = compute_itemsets(df_f, ASSOC_MIN_SUPPORT)
+        if not itemsets_df.empty:
+            itemsets_df = itemsets_df[itemsets_df['Support'] >= min_support]
 
     if assoc_df is None or assoc_df.empty:
         st.warning(f"⚠️ Aucune association forte trouvée au seuil de {min_support}%. Essayez de réduire le seuil.")
@@ -1667,18 +1122,20 @@ elif page == "🔗 Associations Produits":
         st.markdown("### 🕸️ Matrice d'Association Produits")
         st.caption("💡 **Comment lire** : Les couleurs foncées indiquent des associations plus fortes. Utilisez cette matrice pour identifier les clusters de produits.")
 
+        heat_measure = st.radio(
+            "Mesure",
+            ['Fréquence', 'Lift'],
+            horizontal=True,
+            help="Lift > 1 : les deux articles sont commandés ensemble plus souvent que par hasard"
+        )
+
         # Create adjacency matrix
-        top_products = list(
+        top_products = sorted(
             set(assoc_df['Produit A'].head(25)) |
             set(assoc_df['Produit B'].head(25))
         )
 
-        matrix = pd.DataFrame(0, index=top_products, columns=top_products)
-
-        for _, row in assoc_df.iterrows():
-            if row['Produit A'] in top_products and row['Produit B'] in top_products:
-                matrix.loc[row['Produit A'], row['Produit B']] = row['Fréquence']
-                matrix.loc[row['Produit B'], row['Produit A']] = row['Fréquence']
+        matrix = association_matrix(assoc_df, top_products, heat_measure)
 
         fig_heat = px.imshow(
             matrix,
@@ -1696,28 +1153,22 @@ elif page == "🔗 Associations Produits":
         st.markdown("### 🔍 Explorateur d'Associations")
         st.caption("💡 **Outil** : Sélectionnez un produit pour voir avec quels autres articles il est le plus souvent commandé.")
 
-        all_products = sorted(
-            list(set(assoc_df['Produit A']) | set(assoc_df['Produit B']))
-        )
+        if dataset['pairs'] and aggregates:
+            neighbour_index = dataset['pairs']['neighbours']
+        elif dataset['pairs']:
+            neighbour_index = compute_neighbours(f"{handle.version}|{filter_signature}", dataset['pairs'], **filters)
+        else:
+            neighbour_index = build_neighbour_index(assoc_df)
 
         target_product = st.selectbox(
             "Sélectionner un Produit",
-            all_products,
+            neighbour_index['products'],
             help="Voir les produits fréquemment commandés avec cet article"
         )
 
         # Find associations
-        related = assoc_df[
-            (assoc_df['Produit A'] == target_product) |
-            (assoc_df['Produit B'] == target_product)
-        ].copy()
-
-        related['Related_Product'] = related.apply(
-            lambda x: x['Produit B'] if x['Produit A'] == target_product else x['Produit A'],
-            axis=1
-        )
-
-        related = related.sort_values('Fréquence', ascending=False).head(15)
+        related = neighbours_of(neighbour_index, target_product)
+        related = related[related['Support'] >= min_support]
         if not related.empty:
             col_chart, col_data = st.columns([2, 1])
 
@@ -1742,7 +1193,7 @@ elif page == "🔗 Associations Produits":
             with col_data:
                 st.markdown("**Métriques d'Association**")
                 st.dataframe(
-                    related[['Related_Product', 'Fréquence', 'Support']],
+                    related[['Related_Product', 'Fréquence', 'Support', 'Confiance', 'Lift']],
                     width='stretch',
                     height=400
                 )
@@ -1751,7 +1202,9 @@ elif page == "🔗 Associations Produits":
             top_associate = related.iloc[0]
             st.info(
                 f"**{target_product}** est fréquemment commandé avec **{top_associate['Related_Product']}** "
-                f"({top_associate['Support']:.1f}% des commandes). Envisagez de placer ces articles à proximité."
+                f"({top_associate['Support']:.1f}% des commandes, présent dans {top_associate['Confiance']:.0f}% "
+                f"des commandes de {target_product}, lift {top_associate['Lift']:.1f}). "
+                f"Envisagez de placer ces articles à proximité."
             )
         else:
             st.warning(f"Aucune association forte trouvée pour {target_product}")
@@ -1767,6 +1220,16 @@ elif page == "🔗 Associations Produits":
             height=600
         )
 
+        st.markdown("### 🧺 Ensembles Fréquents (3-4 articles)")
+        st.caption(
+            f"Articles commandés ensemble au-delà du seuil de support (paniers de plus de "
+            f"{ASSOC_MAX_BASKET} articles exclus). Lift : fréquence observée / fréquence attendue si indépendants."
+        )
+        if itemsets_df.empty:
+            st.info("Aucun ensemble de 3 articles ou plus au-dessus du seuil.")
+        else:
+            st.dataframe(itemsets_df, width='stretch', height=400)
+
 # =============================================================================
 # PAGE 5: AI INSIGHTS
 # =============================================================================
@@ -1775,9 +1238,11 @@ elif page == "🧠 Insights IA":
     st.markdown("# 🧠 Insights IA & Prédictions")
     st.markdown("Analyses avancées utilisant le Machine Learning")
 
-    tab_anomalies, tab_clustering = st.tabs([
+    tab_anomalies, tab_clustering, tab_forecast, tab_slotting = st.tabs([
         "🚨 Détection Anomalies",
-        "🎯 Clustering Produits"
+        "🎯 Clustering Produits",
+        "📈 Prévisions SKU",
+        "🗺️ Slotting"
     ])
 
     # Anomaly Tab
@@ -1785,8 +1250,17 @@ elif page == "🧠 Insights IA":
         st.markdown("### 🚨 Détection d'Anomalies")
         st.caption("💡 **Vue d'ensemble** : Identification des commandes inhabituelles grâce au Machine Learning (Isolation Forest).")
 
+        alerts = read_alerts(dataset['meta']['source'])
+        if not alerts.empty:
+            st.markdown("#### 🔔 Alertes sur les Nouvelles Commandes")
+            st.caption(
+                f"{len(alerts):,} commande(s) signalée(s) à l'arrivée de nouveaux fichiers, "
+                f"comparées au modèle de référence sans réentraînement."
+            )
+            st.dataframe(alerts.head(50), width='stretch', height=250)
+
         with st.spinner("Détection des anomalies..."):
-            anomalies = compute_anomalies(df_f)
+            anomalies = compute_anomalies(orders_f, anomaly_model(dataset))
 
         if not anomalies.empty:
             st.warning(f"⚠️ {len(anomalies)} commandes anormales détectées")
@@ -1835,10 +1309,10 @@ elif page == "🧠 Insights IA":
     # Clustering Tab
     with tab_clustering:
         st.markdown("### 🎯 Clustering Produits")
-        st.caption("💡 **Vue d'ensemble** : Regroupement stratégique des produits basé sur le volume et la fréquence (K-Means).")
+        st.caption("💡 **Vue d'ensemble** : Regroupement stratégique des produits basé sur le volume, la fréquence, les lignes, les colis, l'étalement sur la semaine et la part de colis complets (K-Means mini-batch).")
 
         with st.spinner("Segmentation des produits..."):
-            cluster_df = compute_clustering(df_f)
+            cluster_df = compute_clustering(df_f, dataset['models'])
 
         if not cluster_df.empty and 'Cluster_Label' in cluster_df.columns:
             # Summary by cluster
@@ -1871,7 +1345,7 @@ elif page == "🧠 Insights IA":
                 x='Frequence',
                 y='Volume',
                 color='Cluster_Label',
-                hover_data=['Article'],
+                hover_data=['Article', 'Lignes', 'Étalement Semaine', 'Part PCB'],
                 title="Segmentation Produits (Volume vs Fréquence)",
                 color_discrete_sequence=['#10b981', '#3b82f6', '#f59e0b'],
                 log_x=True,
@@ -1919,6 +1393,185 @@ elif page == "🧠 Insights IA":
         else:
             st.warning("⚠️ Insufficient data for clustering analysis")
 
+    # Forecast Tab
+    with tab_forecast:
+        st.markdown("### 📈 Prévision de la Demande par Article")
+        st.caption("💡 **Vue d'ensemble** : Prévision journalière de chaque référence, tous les articles calculés en un seul passage vectorisé.")
+
+        col_model, col_horizon, col_brand = st.columns(3)
+        with col_model:
+            forecast_label = st.selectbox("Modèle", list(FORECAST_MODELS))
+        with col_horizon:
+            horizon = st.slider("Horizon (jours)", min_value=7, max_value=56, value=14, step=7)
+        with col_brand:
+            by_brand = st.checkbox("Par marque", value=False, help="Une série par couple article x marque")
+
+        with st.spinner("Calcul des prévisions..."):
+            sku_forecast, sku_history, sku_future = compute_sku_forecast(
+                cells_f, metric, FORECAST_MODELS[forecast_label], horizon, by_brand
+            )
+
+        if not sku_forecast.empty:
+            col_k1, col_k2, col_k3 = st.columns(3)
+            with col_k1:
+                st.metric("Séries prévues", f"{len(sku_forecast):,}")
+            with col_k2:
+                st.metric(f"Volume prévu ({horizon} j)", f"{sku_forecast['Prévision'].sum():,.0f}")
+            with col_k3:
+                st.metric("Moy. Journalière (28 j)", f"{sku_forecast['Moy. 28j'].sum():,.0f}")
+
+            # Total of all series: recent history, then the forecast
+            total = pd.concat([
+                pd.DataFrame({'Date': sku_history.columns[-90:], 'Volume': sku_history.iloc[:, -90:].sum().to_numpy(), 'Série': 'Réel'}),
+                pd.DataFrame({'Date': sku_future.columns, 'Volume': sku_future.sum().to_numpy(), 'Série': 'Prévision'})
+            ])
+            fig_total = px.line(
+                total,
+                x='Date',
+                y='Volume',
+                color='Série',
+                title="Volume Journalier Total : Réel et Prévision",
+                color_discrete_map={'Réel': '#3b82f6', 'Prévision': '#f59e0b'}
+            )
+            fig_total.update_layout(height=400, template='plotly_white', yaxis_title="📦 Volume (Unités)")
+            st.plotly_chart(fig_total, width='stretch')
+
+            col_list, col_detail = st.columns([1, 2])
+
+            with col_list:
+                st.markdown("**Top 50 Prévisions**")
+                st.dataframe(sku_forecast.head(50), width='stretch', height=400)
+
+            with col_detail:
+                labels = sku_forecast[['Article', 'Marque'] if by_brand else ['Article']].head(50).astype(str).agg(' - '.join, axis=1)
+                position = st.selectbox("Détail d'un article", range(len(labels)), format_func=lambda i: labels.iloc[i])
+                detail = pd.concat([
+                    pd.DataFrame({'Date': sku_history.columns[-90:], 'Volume': sku_history.iloc[position, -90:].to_numpy(), 'Série': 'Réel'}),
+                    pd.DataFrame({'Date': sku_future.columns, 'Volume': sku_future.iloc[position].to_numpy(), 'Série': 'Prévision'})
+                ])
+                fig_detail = px.line(
+                    detail,
+                    x='Date',
+                    y='Volume',
+                    color='Série',
+                    title=f"Prévision : {labels.iloc[position]}",
+                    color_discrete_map={'Réel': '#3b82f6', 'Prévision': '#f59e0b'}
+                )
+                fig_detail.update_layout(height=400, template='plotly_white')
+                st.plotly_chart(fig_detail, width='stretch')
+        else:
+            st.warning("⚠️ Données insuffisantes pour la prévision")
+
+        st.markdown("---")
+        if st.checkbox("🧪 Backtest des modèles", value=False, help="Rejoue l'historique complet avec une origine de prévision au début de chaque mois"):
+            with st.spinner("Backtest des modèles..."):
+                backtest = compute_backtest(handle.version, dataset['cube']['cells'], metric, horizon, by_brand)
+
+            if backtest.empty:
+                st.info(f"Historique insuffisant : au moins {BACKTEST_MIN_HISTORY} jours avant un début de mois et {horizon} jours après.")
+            else:
+                st.caption(
+                    f"Toutes les données chargées, {backtest['Origines'].iloc[0]} origines mensuelles, horizon {horizon} jours. "
+                    f"MAPE sur les jours avec ventes ; WAPE et biais rapportés au volume réel."
+                )
+                col_bt_table, col_bt_chart = st.columns([3, 2])
+                with col_bt_table:
+                    st.dataframe(backtest, width='stretch')
+                with col_bt_chart:
+                    fig_bt = px.bar(
+                        backtest,
+                        x='Modèle',
+                        y='WAPE (%)',
+                        color='Biais (%)',
+                        color_continuous_scale='RdBu_r',
+                        title="Erreur Pondérée par Modèle (WAPE)"
+                    )
+                    fig_bt.update_layout(height=350, template='plotly_white')
+                    st.plotly_chart(fig_bt, width='stretch')
+
+    # Slotting Tab
+    with tab_slotting:
+        st.markdown("### 🗺️ Optimisation de l'Emplacement (Slotting)")
+        st.caption(
+            "💡 **Vue d'ensemble** : Affectation des références aux emplacements d'une grille d'allées parallèles. "
+            "Les articles les plus prélevés (lignes) se rapprochent du dépôt et les articles souvent commandés "
+            "ensemble se rapprochent l'un de l'autre."
+        )
+
+        slot_clusters = compute_clustering(df_f, dataset['models'])
+        if slot_clusters.empty:
+            st.warning("⚠️ Données insuffisantes pour le slotting")
+        else:
+            with st.expander("⚙️ Grille d'Emplacements", expanded=False):
+                col_g1, col_g2, col_g3, col_g4, col_g5 = st.columns(5)
+                with col_g1:
+                    aisles = st.number_input("Allées", min_value=1, max_value=500, value=20)
+                with col_g2:
+                    slots = st.number_input(
+                        "Emplacements / allée", min_value=1, max_value=5000,
+                        value=int(min(5000, max(1, np.ceil(len(slot_clusters) / 20))))
+                    )
+                with col_g3:
+                    aisle_spacing = st.number_input("Entraxe allées (m)", min_value=0.5, value=3.0, step=0.5)
+                with col_g4:
+                    slot_width = st.number_input("Largeur emplacement (m)", min_value=0.1, value=1.0, step=0.1)
+                with col_g5:
+                    affinity_weight = st.number_input(
+                        "Poids affinités", min_value=0.0, value=1.0, step=0.5,
+                        help="Importance des trajets entre articles commandés ensemble par rapport aux allers-retours au dépôt"
+                    )
+
+            with st.spinner("Optimisation des emplacements..."):
+                if dataset['pairs']:
+                    affinity_df, _ = assoc_from_partials(dataset['pairs'], 0, SLOTTING_PAIRS, **filters)
+                else:
+                    affinity_df, _ = compute_assoc(df_f, 0, SLOTTING_PAIRS)
+                slotting, slot_stats = compute_slotting(
+                    slot_clusters, affinity_df, int(aisles), int(slots), aisle_spacing, slot_width, affinity_weight
+                )
+
+            if slot_stats:
+                baseline_travel, optimized_travel = sum(slot_stats['baseline']), sum(slot_stats['optimized'])
+                reduction = (1 - optimized_travel / baseline_travel) * 100 if baseline_travel else 0
+
+                col_s1, col_s2, col_s3 = st.columns(3)
+                with col_s1:
+                    st.metric("Trajet Référence (km)", f"{baseline_travel / 1000:,.1f}")
+                with col_s2:
+                    st.metric("Trajet Optimisé (km)", f"{optimized_travel / 1000:,.1f}", delta=f"{-reduction:.1f}%", delta_color="inverse")
+                with col_s3:
+                    st.metric("Références Placées", f"{slot_stats['slotted']:,}")
+
+                st.caption(
+                    "Trajet estimé : aller-retour au dépôt pour chaque ligne, plus la distance entre les articles de chaque paire "
+                    "commandée ensemble (pondérée). Référence : articles rangés par code, allée par allée."
+                )
+                st.caption(
+                    "ℹ️ La fréquence de prélèvement est le nombre de lignes de chaque article dans les lignes du clustering "
+                    "(filtres appliqués) ; la classe ABC n'intervient pas dans l'affectation."
+                )
+                if slot_stats['skipped']:
+                    st.warning(f"⚠️ Grille trop petite : {slot_stats['skipped']:,} références les moins prélevées ne sont pas placées")
+
+                heat = slotting.pivot_table(index='Position', columns='Allée', values='Lignes', aggfunc='sum')
+                fig_slot = go.Figure(data=go.Heatmap(
+                    z=heat.to_numpy(),
+                    x=heat.columns,
+                    y=heat.index,
+                    colorscale='YlOrRd',
+                    colorbar=dict(title="Lignes")
+                ))
+                fig_slot.update_layout(
+                    title="Lignes Prélevées par Emplacement (dépôt en bas à gauche)",
+                    xaxis_title="Allée",
+                    yaxis_title="Position dans l'allée",
+                    height=500,
+                    template='plotly_white'
+                )
+                st.plotly_chart(fig_slot, width='stretch')
+
+                st.dataframe(slotting, width='stretch', height=400)
+
 # =============================================================================
 # PAGE 6: DATA EXPORT
 # =============================================================================
@@ -1936,39 +1589,45 @@ elif page == "📅 Export de Données":
         export_datasets = {}
 
         # Basic stats
-        kpis = compute_global_kpis(df_f)
+        kpis = compute_global_kpis(aggregates['orders'] if aggregates else orders_f)
 
         # ABC Analysis
         if st.checkbox("Inclure Analyse ABC", value=True):
-            abc_data = compute_abc(df_f, metric)
+            abc_data = abc_from_partials(aggregates['articles'], metric) if aggregates else compute_abc(cells_f, metric)
             if not abc_data.empty:
                 export_datasets['ABC_Analysis'] = abc_data
 
         # Associations
         if st.checkbox("Inclure Associations Produits", value=True):
-            assoc_data, _ = compute_assoc(df_f, 5)
+            if aggregates:
+                assoc_data, _ = assoc_from_pairs(aggregates['pairs'], aggregates['baskets'], 5, aggregates['items'])
+            elif dataset['pairs']:
+                assoc_data, _ = assoc_from_partials(dataset['pairs'], 5, **filters)
+            else:
+                assoc_data, _ = compute_assoc(df_f, 5)
             if assoc_data is not None:
                 export_datasets['Associations'] = assoc_data
 
         # Geographic
         if st.checkbox("Inclure Données Géographiques", value=True):
-            geo_data = compute_geo_data(df_f)
+            geo_data = compute_geo_data(cells_f, members_f)
             if not geo_data.empty:
                 export_datasets['Geography'] = geo_data
 
         # Daily summary
         if st.checkbox("Inclure Résumé Quotidien", value=True):
-            daily_summary = df_f.groupby('Date').agg({
+            daily_summary = cells_f.groupby('Date').agg({
                 metric: 'sum',
-                'No Op': 'nunique',
                 'Article': 'nunique'
-            }).reset_index()
+            })
+            daily_summary['Orders'] = members_f.groupby('Date')['No Op'].nunique()
+            daily_summary = daily_summary.reset_index()[['Date', metric, 'Orders', 'Article']]
             daily_summary.columns = ['Date', 'Volume', 'Orders', 'Unique_SKUs']
             export_datasets['Daily_Summary'] = daily_summary
 
         # Product summary
         if st.checkbox("Inclure Résumé Produits", value=True):
-            product_summary = df_f.groupby('Article').agg({
+            product_summary = df_f.groupby('Article', observed=True).agg({
                 metric: 'sum',
                 'No Op': 'nunique'
             }).reset_index()
@@ -2007,7 +1666,7 @@ elif page == "📅 Export de Données":
     with col_exp2:
         st.markdown("### 📋 Résumé Exécutif")
 
-        kpis = compute_global_kpis(df_f)
+        kpis = compute_global_kpis(aggregates['orders'] if aggregates else orders_f)
         summary_report = create_summary_report(df_f, kpis)
 
         st.text_area(
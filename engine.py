@@ -0,0 +1,2895 @@
+"""
+Data engine of WMS Analytics Pro
+Loading, caching and cleaning of the Parquet history, shared dataset versions, filter index, cube,
+aggregates and the analyses behind the pages of app.py (which only renders them)
+"""
+
+import streamlit as st
+import pandas as pd
+import numpy as np
+from pathlib import Path
+from scipy import sparse
+import pyarrow as pa
+import pyarrow.compute as pc
+import pyarrow.dataset as ds
+import pyarrow.feather as feather
+import pyarrow.parquet as pq
+import pyarrow.types as pa_types
+from io import BytesIO
+from contextlib import nullcontext
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Tuple, Optional, Dict, List
+import re
+import os
+import json
+import hashlib
+import tempfile
+import threading
+import weakref
+import time
+import functools
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.preprocessing import StandardScaler
+from sklearn.ensemble import IsolationForest
+import joblib
+from datetime import datetime
+import forecasting
+import warnings
+warnings.filterwarnings('ignore')
+
+# Configuration
+ENCODINGS = ['utf-8-sig', 'utf-8', 'latin-1', 'cp1252', 'iso-8859-1']
+VALID_BRANDS = ['ER', 'OC', 'ME']
+DATE_FORMATS = ['%d/%m/%Y', '%Y-%m-%d', '%d/%m/%Y %H:%M:%S', '%Y-%m-%d %H:%M:%S']  # Parsed before falling back to inference
+DAYS_EN = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday', 'Saturday', 'Sunday']
+DAYS_FR = ['Lundi', 'Mardi', 'Mercredi', 'Jeudi', 'Vendredi', 'Samedi', 'Dimanche']
+LOAD_WORKERS = min(8, os.cpu_count() or 1)  # Threads used to read Parquet files in parallel
+
+# Source column aliases unified at load time
+COLUMN_MAP = {
+    'v_Code Pays Facturation': 'Pays',
+    'Pays de Livraison': 'Pays',
+    'Pays Facturation': 'Pays',
+    'Code Pays': 'Pays'
+}
+
+# Persistent cache of the cleaned dataset, stored next to the data folder
+CACHE_DIR_NAME = '.wms_cache'
+CACHE_FORMAT_VERSION = 9  # Bump when clean_data/process_dates output changes
+
+# Streaming mode: exact aggregates over the full history, computed batch by batch
+STREAM_BATCH_ROWS = 250_000  # Rows decoded per Arrow batch
+STREAM_BUCKETS = 16  # Hash buckets used to spill baskets for exact pair counts
+
+# Association analysis (see compute_assoc / compute_itemsets)
+ASSOC_TOP_K = 100  # Pairs / itemsets reported per size
+ASSOC_MIN_SUPPORT = 0.1  # Lowest support (%) offered by the association sliders, itemsets are mined at it
+ASSOC_MAX_ITEMSET = 4  # Largest frequent itemset mined
+ASSOC_MAX_BASKET = 200  # Baskets with more distinct articles are skipped when mining 3+ itemsets
+ASSOC_FRONTIER = 2000  # Most frequent itemsets of a size extended to the next size
+ASSOC_NEIGHBOURS = 15  # Partners kept per article by the recommender index
+
+# Per-SKU forecast models (see compute_sku_forecast and forecasting.py)
+FORECAST_MODELS = {
+    'Profil hebdomadaire': 'weekday_profile',
+    'Lissage exponentiel': 'ses',
+    'Saisonnier naïf': 'seasonal_naive',
+    'Moyenne mobile 7j': 'moving_average'
+}
+BACKTEST_WORKERS = 4  # Processes evaluating (model, origin) pairs in parallel
+BACKTEST_POOL_MIN_CELLS = 5_000_000  # Series x days below which spawning workers costs more than it saves
+BACKTEST_MIN_HISTORY = 28  # Days of history required before the first forecast origin
+
+# Order anomaly model (see anomaly_model)
+ANOMALY_FEATURES = ['Volume', 'Lignes', 'Colis']
+ANOMALY_CONTAMINATION = 0.02  # Expected share of abnormal orders
+ANOMALY_MAX_SAMPLES = 50_000  # Orders drawn to fit the model on large datasets
+ANOMALY_ALERTS_MAX = 5000  # Most recent alerts kept for new orders (see score_new_orders)
+
+# SKU clustering (see compute_clustering)
+CLUSTER_COUNT = 3  # Gold / Silver / Bronze
+CLUSTER_BATCH_SIZE = 4096  # SKUs per mini-batch update
+CLUSTER_FEATURES = ['Volume', 'Frequence', 'Lignes', 'Colis', 'Étalement Semaine', 'Part PCB']
+
+# Slotting optimizer (see optimize_slotting)
+SLOTTING_PAIRS = 20_000  # Strongest product pairs used as affinities
+SLOTTING_ROUNDS = 50  # Local-search rounds of improving swaps
+SLOTTING_SECONDS = 5.0  # Time budget of the local search
+
+# Picking mode of each line (see picking_modes), first matching rule wins
+PICKING_BULK_UNITS = 10  # Lines of more units that are not whole packages are picked in bulk
+PICKING_MODES = ['Colis Complet (PCB)', 'Sous-Colis (SPCB)', f'Bulk (>{PICKING_BULK_UNITS} unités)', 'Picking Détail']
+
+# Mergeable aggregates stored per cached partition (see build_partials)
+PARTIAL_KINDS = ['articles', 'orders', 'pairs', 'items']
+
+# OLAP cube grain (see build_cube)
+CUBE_DIMENSIONS = ['DayKey', 'Article', 'Marque', 'Pays', 'Mode Picking']
+
+# Order fact grain (see build_order_facts)
+FACT_KEYS = ['No Op', 'Marque', 'DayKey']
+
+# Key columns dictionary-encoded at ingest (integer codes + category labels for display)
+KEY_COLUMNS = ['Article', 'No Op']
+
+# Columns used by the application (after COLUMN_MAP) - only these are read from Parquet
+LOAD_COLUMNS = [
+    'Article', 'Nbre Unités', 'Quantité préparée', 'Nbre Colis', 'PCB', 'SPCB',
+    'No Op', 'Marque', 'Pays', 'Date Expedition Colis'
+]
+
+# Columns kept when the load plan has to prune (quality, geography and picking modes are lost)
+CORE_COLUMNS = ['Article', 'Nbre Unités', 'Nbre Colis', 'No Op', 'Marque', 'Date Expedition Colis']
+
+# Memory governor (see plan_load)
+MEMORY_BUDGET_MB = 4096  # Default RAM budget for the in-memory dataset
+LOAD_OVERHEAD = 3.0  # Peak memory during load + cleaning, relative to the decoded columns
+PY_STR_BYTES = 50  # Approximate size of a Python string object (header + short code)
+
+# =============================================================================
+# CORE BUSINESS LOGIC - OPTIMIZED
+# =============================================================================
+
+@st.cache_data(show_spinner=False, ttl=3600, max_entries=2)
+def load_data(
+    folder: str,
+    parallel: bool = True,
+    months: Optional[Tuple[str, ...]] = None,
+    files: Optional[Tuple[str, ...]] = None,
+    columns: Optional[Tuple[str, ...]] = None,
+    categorical: Tuple[str, ...] = (),
+    sample_fraction: Optional[float] = None
+) -> Tuple[Optional[pd.DataFrame], Optional[str]]:
+    """
+    Load data from Parquet files with robust error handling and memory management
+    Files are read concurrently on a thread pool when parallel=True
+    Only LOAD_COLUMNS (or the given columns) are read; the months ('YYYY-MM') filter is pushed down
+    to the Parquet reader (brands are filtered by clean_data, after normalization). files restricts loading to the given file names (incremental refresh).
+    categorical and sample_fraction come from the load plan (see plan_load)
+    Returns: (DataFrame, Error Message)
+    """
+    # Configuration limits to prevent crashes
+    MAX_FILES = 50  # Max 50 files
+
+    try:
+        path = Path(folder)
+        if not path.exists():
+            return None, f"⚠️ Directory not found: {folder}"
+
+        # Load Parquet files
+        selected = set(files) if files is not None else None
+        files = sorted(f for f in path.glob("*.parquet") if selected is None or f.name in selected)
+        if not files:
+            return None, "⚠️ No Parquet files found in directory."
+
+        # Limit number of files
+        if len(files) > MAX_FILES:
+            st.warning(f"⚠️ Found {len(files)} files. Loading only the first {MAX_FILES} files.")
+            files = files[:MAX_FILES]
+
+        results = {}
+        failed_files = []
+
+        progress_bar = st.progress(0)
+        status_text = st.empty()
+
+        # Read files on a thread pool (pyarrow releases the GIL while decoding)
+        workers = LOAD_WORKERS if parallel else 1
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            futures = {
+                executor.submit(
+                    _read_source_file, file, months, columns, categorical, sample_fraction
+                ): i
+                for i, file in enumerate(files)
+            }
+
+            for done, future in enumerate(as_completed(futures), start=1):
+                i = futures[future]
+                status_text.text(f"Chargement {files[i].name}... ({done}/{len(files)})")
+
+                try:
+                    results[i] = future.result()
+                except MemoryError:
+                    st.error(f"❌ Memory error loading {files[i].name}. Lower the memory budget to load in streaming mode.")
+                    for pending in futures:
+                        pending.cancel()
+                    break
+                except Exception as e:
+                    failed_files.append(f"{files[i].name} ({str(e)[:50]})")
+
+                progress_bar.progress(done / len(files))
+
+        progress_bar.empty()
+        status_text.empty()
+
+        # Keep file order so results do not depend on thread scheduling
+        all_dfs = [results.pop(i) for i in range(len(files)) if i in results]
+        total_rows = sum(len(df) for df in all_dfs)
+
+        if not all_dfs:
+            return None, "⚠️ Could not read any files. Check file format."
+
+        # Display warnings
+        if failed_files:
+            st.warning(f"⚠️ Could not load {len(failed_files)} file(s): {', '.join(failed_files[:3])}")
+        if sample_fraction:
+            st.info(f"ℹ️ Sampling {sample_fraction:.0%} of rows to fit the memory budget")
+
+        # Concatenate with memory-efficient method
+        try:
+            combined_df = _concat_parts(all_dfs)
+
+            # Clear individual dataframes from memory
+            del all_dfs
+
+            st.success(f"✅ {len(files)} fichier(s) Parquet chargé(s) - {total_rows:,} lignes au total")
+
+            return combined_df, None
+
+        except MemoryError:
+            return None, "⚠️ Memory error during data concatenation. Lower the memory budget to load in streaming mode."
+
+    except Exception as e:
+        return None, f"⚠️ Critical error: {str(e)}"
+
+
+def _read_source_file(
+    file: Path,
+    months: Optional[Tuple[str, ...]] = None,
+    columns: Optional[Tuple[str, ...]] = None,
+    categorical: Tuple[str, ...] = (),
+    sample_fraction: Optional[float] = None
+) -> pd.DataFrame:
+    """
+    Read, normalize and optimize a single Parquet file (runs on worker threads, no Streamlit calls)
+    """
+    # Load only the needed columns, skipping rows that cannot match the filters
+    schema = pq.read_schema(file)
+    projection = _parquet_projection(schema.names, columns)
+    filters = _parquet_filters(schema, projection, file.name, months)
+    read_dictionary = [name for name, unified in projection.items() if unified in categorical]
+    df = pq.read_table(
+        file,
+        columns=list(projection),
+        filters=filters,
+        read_dictionary=read_dictionary or None
+    ).to_pandas()
+
+    # Sample when the plan says the full data does not fit in memory
+    if sample_fraction:
+        df = df.sample(frac=sample_fraction, random_state=42)
+
+    df = _normalize_columns(df, projection, file.name)
+
+    # Optimize memory usage
+    df = optimize_dataframe_memory(df)
+
+    return df
+
+
+def _normalize_columns(df: pd.DataFrame, columns: Dict[str, str], source: str) -> pd.DataFrame:
+    """
+    Unify column names, add missing PCB/SPCB columns and tag rows with their source file
+    """
+    # Unify column names
+    df.rename(columns=columns, inplace=True)
+
+    # Add missing columns with defaults (memory efficient)
+    if 'PCB' not in df.columns:
+        df['PCB'] = np.nan
+    if 'SPCB' not in df.columns:
+        df['SPCB'] = np.nan
+
+    df['_Source'] = source
+    return df
+
+
+def _parquet_projection(names: List[str], columns: Optional[Tuple[str, ...]] = None) -> Dict[str, str]:
+    """
+    Map raw Parquet column names to the LOAD_COLUMNS (or given columns) they provide
+    Returns: {raw name: unified name}, keeping the first alias found for each column
+    """
+    wanted = columns or LOAD_COLUMNS
+    projection = {}
+    for name in names:
+        unified = COLUMN_MAP.get(name.strip(), name.strip())
+        if unified in wanted and unified not in projection.values():
+            projection[name] = unified
+    return projection
+
+
+def _parquet_filters(
+    schema,
+    columns: Dict[str, str],
+    filename: str,
+    months: Optional[Tuple[str, ...]]
+) -> Optional[pc.Expression]:
+    """
+    Build a pyarrow filter expression for month pushdown
+    Plain comparisons on typed columns let the reader prune row groups from their statistics
+    Brands are not pushed down: raw values (' er', 'Er') only match VALID_BRANDS once clean_data
+    has normalized them
+    """
+    raw = {unified: name for name, unified in columns.items()}
+    if not months or 'Date Expedition Colis' not in raw:
+        return None
+
+    name = raw['Date Expedition Colis']
+    field = pc.field(name)
+    month_expr = None
+
+    for month in months:
+        year, mon = month.split('-')
+        field_type = schema.field(name).type
+        if pa_types.is_temporal(field_type):
+            start = pd.Timestamp(f"{month}-01")
+            end = start + pd.offsets.MonthBegin(1)
+            if pa_types.is_date(field_type):
+                start, end = start.date(), end.date()
+            cond = (field >= start) & (field < end)
+        else:
+            # Text dates: 'dd/mm/yyyy' (French exports) or ISO 'yyyy-mm-dd'
+            cond = (
+                pc.match_substring(field, pattern=f"/{mon}/{year}") |
+                pc.match_substring(field, pattern=f"{year}-{mon}")
+            )
+        month_expr = cond if month_expr is None else (month_expr | cond)
+
+    # Rows without a date fall back to the filename month in process_dates
+    file_month = re.search(r'(\d{4}-\d{2})', filename)
+    if file_month and file_month.group(1) in months:
+        month_expr = month_expr | field.is_null()
+
+    return month_expr
+
+
+def plan_load(
+    folder: str,
+    budget_mb: float = MEMORY_BUDGET_MB,
+    months: Optional[Tuple[str, ...]] = None,
+    streaming: bool = False
+) -> Dict:
+    """
+    Choose a loading strategy from Parquet footers (row counts, column sizes, dictionary encodings)
+    before any data is decoded. Only the row groups that can hold the selected months are counted
+    (see _row_group_months). Strategies, from most to least complete:
+    - full: LOAD_COLUMNS, strings decoded as Python objects
+    - categorical: LOAD_COLUMNS, dictionary-encoded strings decoded straight to categoricals
+    - pruned: CORE_COLUMNS only, categorical decoding
+    - streaming: aggregates streamed over the full history, lines sampled to fit the budget
+    streaming=True asks for the last one whatever the budget allows
+    """
+    path = Path(folder)
+    files = sorted(path.glob("*.parquet")) if path.exists() else []
+
+    rows = 0
+    object_bytes = {}  # unified column -> estimated bytes as objects
+    category_bytes = {}  # unified column -> estimated bytes as categoricals
+    dictionary = {}  # unified column -> dictionary-encoded in every file
+
+    for file in files:
+        try:
+            metadata = pq.ParquetFile(file).metadata
+        except Exception:
+            continue
+
+        projection = _parquet_projection(metadata.schema.names)
+        file_month = re.search(r'(\d{4}-\d{2})', file.name)
+
+        for g in range(metadata.num_row_groups):
+            group = metadata.row_group(g)
+            if months and not _row_group_months(group, projection, months, file_month.group(1) if file_month else None):
+                continue
+            rows += group.num_rows
+
+            for c in range(group.num_columns):
+                chunk = group.column(c)
+                unified = projection.get(chunk.path_in_schema)
+                if unified is None:
+                    continue
+
+                n = group.num_rows
+                if chunk.physical_type != 'BYTE_ARRAY':
+                    obj = cat = n * 8
+                elif chunk.has_dictionary_page:
+                    # Each distinct value becomes one Python string
+                    stats = chunk.statistics if chunk.is_stats_set else None
+                    if stats is not None and stats.has_distinct_count:
+                        distinct = stats.distinct_count
+                    else:
+                        # Rough heuristic when the writer stored no distinct count: ~8 bytes per
+                        # dictionary entry (short codes plus their length prefix)
+                        distinct = max(chunk.data_page_offset - chunk.dictionary_page_offset, 0) / 8 + 1
+                    obj = n * 8 + distinct * PY_STR_BYTES
+                    cat = n * 4 + distinct * PY_STR_BYTES
+                else:
+                    obj = cat = n * (8 + PY_STR_BYTES)
+
+                object_bytes[unified] = object_bytes.get(unified, 0) + obj
+                category_bytes[unified] = category_bytes.get(unified, 0) + cat
+                dictionary[unified] = dictionary.get(unified, True) and (
+                    chunk.physical_type == 'BYTE_ARRAY' and chunk.has_dictionary_page
+                )
+
+    def estimate(sizes: Dict[str, float], columns: List[str]) -> float:
+        return sum(sizes.get(col, 0) for col in columns) * LOAD_OVERHEAD / (1024 * 1024)
+
+    estimates = {
+        'full': estimate(object_bytes, LOAD_COLUMNS),
+        'categorical': estimate(category_bytes, LOAD_COLUMNS),
+        'pruned': estimate(category_bytes, CORE_COLUMNS)
+    }
+    categorical = tuple(col for col, is_dict in dictionary.items() if is_dict)
+
+    plan = {
+        'strategy': 'streaming',
+        'budget_mb': float(budget_mb),
+        'rows': rows,
+        'estimates_mb': estimates,
+        'columns': tuple(CORE_COLUMNS),
+        'categorical': categorical,
+        'sample_fraction': None
+    }
+
+    if streaming:
+        pass
+    elif estimates['full'] <= budget_mb:
+        plan.update(strategy='full', columns=tuple(LOAD_COLUMNS), categorical=())
+    elif estimates['categorical'] <= budget_mb:
+        plan.update(strategy='categorical', columns=tuple(LOAD_COLUMNS))
+    elif estimates['pruned'] <= budget_mb:
+        plan.update(strategy='pruned')
+    if plan['strategy'] == 'streaming' and estimates['pruned'] > budget_mb:
+        plan['sample_fraction'] = round(max(budget_mb / estimates['pruned'], 0.01), 4)
+
+    return plan
+
+
+def _row_group_months(group, projection: Dict[str, str], months: Tuple[str, ...], file_month: Optional[str]) -> bool:
+    """
+    Whether a Parquet row group can hold rows of the selected months: from the min / max statistics of
+    a typed date column, else from the month in the file name (text dates have no usable statistics)
+    """
+    for c in range(group.num_columns):
+        chunk = group.column(c)
+        if projection.get(chunk.path_in_schema) != 'Date Expedition Colis':
+            continue
+        stats = chunk.statistics if chunk.is_stats_set else None
+        if stats is not None and stats.has_min_max and hasattr(stats.min, 'year'):
+            low, high = pd.Timestamp(stats.min), pd.Timestamp(stats.max)
+            return any(
+                low < pd.Timestamp(f"{month}-01") + pd.offsets.MonthBegin(1) and high >= pd.Timestamp(f"{month}-01")
+                for month in months
+            )
+    return file_month is None or file_month in months
+
+
+def list_source_months(folder: str) -> List[str]:
+    """
+    Months ('YYYY-MM') found in the Parquet file names of a folder
+    """
+    path = Path(folder)
+    if not path.exists():
+        return []
+
+    months = set()
+    for file in path.glob("*.parquet"):
+        match = re.search(r'(\d{4}-\d{2})', file.name)
+        if match:
+            months.add(match.group(1))
+    return sorted(months)
+
+
+def optimize_dataframe_memory(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Optimize DataFrame memory usage by downcasting numeric types
+    """
+    try:
+        for col in df.columns:
+            col_type = df[col].dtype
+
+            # Optimize integer columns
+            if col_type == 'int64':
+                df[col] = pd.to_numeric(df[col], downcast='integer')
+
+            # Optimize float columns
+            elif col_type == 'float64':
+                df[col] = pd.to_numeric(df[col], downcast='float')
+
+            # Convert object columns with few unique values to category
+            elif col_type == 'object':
+                num_unique = df[col].nunique()
+                num_total = len(df[col])
+                if num_unique / num_total < 0.5:  # Less than 50% unique values
+                    df[col] = df[col].astype('category')
+
+        return df
+    except Exception:
+        # If optimization fails, return original df
+        return df
+
+def clean_data(df: pd.DataFrame, verbose: bool = True) -> pd.DataFrame:
+    """
+    Comprehensive data cleaning and validation with memory optimization
+    verbose=False skips spinners and summary messages (streaming batches)
+    """
+    try:
+        original_count = len(df)
+
+        # Verify minimum required columns exist
+        required_cols = ['Article', 'Nbre Unités']
+        missing_cols = [col for col in required_cols if col not in df.columns]
+        if missing_cols:
+            st.error(f"❌ Missing required columns: {', '.join(missing_cols)}")
+            return pd.DataFrame()
+
+        # Clean Article codes (string work runs once per distinct code)
+        with _spinner("Nettoyage des codes articles...", verbose):
+            df['Article'] = _normalize_labels(df['Article'])
+            labels = df['Article'].cat.categories
+            junk = (
+                (labels == '') |
+                (labels == 'NAN') |
+                labels.str.contains('TOTAL|SOMME|ARTICLE|UNDEFINED', case=False, na=False, regex=True)
+            )
+            df = df[~np.asarray(junk)[df['Article'].cat.codes]]
+
+        # Convert numeric columns efficiently
+        with _spinner("Conversion des colonnes numériques...", verbose):
+            numeric_cols = ['Nbre Unités', 'Quantité préparée', 'Nbre Colis', 'PCB', 'SPCB']
+            for col in numeric_cols:
+                if col in df.columns:
+                    df[col] = _to_float32(df[col])
+
+        # Handle dates intelligently
+        with _spinner("Traitement des dates...", verbose):
+            df = process_dates(df)
+
+        # Clean and validate brands
+        with _spinner("Validation des marques...", verbose):
+            if 'Marque' in df.columns:
+                df['Marque'] = _normalize_labels(df['Marque'])
+                df = df[df['Marque'].isin(VALID_BRANDS)]
+                df['Marque'] = df['Marque'].cat.remove_unused_categories()
+            else:
+                st.warning("⚠️ 'Marque' column not found. Creating default brand.")
+                df['Marque'] = 'ER'
+
+        # Clean operation numbers
+        if 'No Op' in df.columns:
+            df['No Op'] = _normalize_labels(df['No Op'], upper=False)
+            df = df[df['No Op'] != '']
+
+        # Remove duplicates efficiently
+        with _spinner("Suppression des doublons...", verbose):
+            df = df.drop_duplicates(keep='first')
+
+        # Filter out invalid data
+        df = df[df['Nbre Unités'] >= 0]
+
+        # Group and join on integer codes from here on
+        df = encode_keys(df)
+
+        # Reset index to optimize memory
+        df.reset_index(drop=True, inplace=True)
+
+        cleaned_count = len(df)
+
+        if cleaned_count == 0:
+            st.error("❌ No valid data remaining after cleaning!")
+            return pd.DataFrame()
+
+        if verbose:
+            if cleaned_count < original_count * 0.5:
+                st.warning(f"⚠️ Data cleaning removed {original_count - cleaned_count:,} rows ({(1-cleaned_count/original_count)*100:.1f}%)")
+            else:
+                st.info(f"✅ Data cleaned: {cleaned_count:,} rows kept from {original_count:,}")
+
+        return df
+
+    except MemoryError:
+        st.error("❌ Memory error during data cleaning. Try loading less data.")
+        return pd.DataFrame()
+    except Exception as e:
+        st.error(f"❌ Error during data cleaning: {str(e)}")
+        return pd.DataFrame()
+
+def _normalize_labels(values: pd.Series, upper: bool = True) -> pd.Series:
+    """
+    Stripped (and upper-cased) string labels as a categorical, normalized once per distinct value
+    Missing values become 'nan' like astype(str) would
+    """
+    codes, uniques = pd.factorize(values, use_na_sentinel=False)
+    labels = pd.Index(uniques).astype(str)
+    labels = labels.str.upper().str.strip() if upper else labels.str.strip()
+
+    # Distinct raw values can normalize to the same label
+    label_codes, categories = pd.factorize(labels)
+    return pd.Series(
+        pd.Categorical.from_codes(label_codes[codes], categories=categories),
+        index=values.index
+    )
+
+def _to_float32(values: pd.Series) -> pd.Series:
+    """
+    Numeric column as float32 with missing values as 0
+    Text ('1,5') is parsed once per distinct value; numeric dtypes skip parsing
+    """
+    if not pd.api.types.is_numeric_dtype(values):
+        codes, uniques = pd.factorize(values, use_na_sentinel=False)
+        parsed = pd.to_numeric(pd.Index(uniques).astype(str).str.replace(',', '.'), errors='coerce')
+        values = pd.Series(np.asarray(parsed, dtype='float64')[codes], index=values.index)
+    return values.fillna(0).astype('float32')
+
+def encode_keys(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Dictionary-encode KEY_COLUMNS as categoricals: compact integer codes with the labels kept once
+    Groupbys on these columns must pass observed=True
+    """
+    for col in KEY_COLUMNS:
+        if col in df.columns:
+            values = df[col]
+            if isinstance(values.dtype, pd.CategoricalDtype):
+                # Already categorical (see _normalize_labels): drop unused labels and sort the rest
+                values = values.cat.remove_unused_categories()
+                df[col] = values.cat.reorder_categories(values.cat.categories.sort_values())
+            else:
+                codes, labels = pd.factorize(values, sort=True)
+                df[col] = pd.Categorical.from_codes(codes, categories=labels)
+    return df
+
+def _spinner(text: str, verbose: bool = True):
+    """
+    Streamlit spinner, or a no-op context when running quietly
+    """
+    return st.spinner(text) if verbose else nullcontext()
+
+def process_dates(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Intelligent date processing with fallbacks and error handling
+    Parsing runs once per distinct value and calendar columns once per distinct day (see build_calendar)
+    """
+    try:
+        if 'Date Expedition Colis' in df.columns:
+            # Try to parse existing dates, then fall back to the month in the file name
+            df['Date'] = _parse_dates(df['Date Expedition Colis'])
+            mask_na = df['Date'].isna()
+            if mask_na.any() and '_Source' in df.columns:
+                df.loc[mask_na, 'Date'] = _source_month_starts(df.loc[mask_na, '_Source'])
+        else:
+            # Full fallback: extract from filename
+            df['Date'] = _source_month_starts(df['_Source'], default='2025-01')
+
+        # Final fallback for any remaining NaT
+        df['Date'] = df['Date'].fillna(pd.Timestamp.now())
+
+        return _add_calendar(df)
+
+    except Exception as e:
+        st.warning(f"⚠️ Error processing dates: {str(e)}. Using default dates.")
+        # If all else fails, use current date
+        df['Date'] = pd.Timestamp.now()
+        return _add_calendar(df)
+
+def _parse_dates(values: pd.Series) -> pd.Series:
+    """
+    Parse each distinct value once: DATE_FORMATS first, then day-first inference for the rest
+    """
+    if pd.api.types.is_datetime64_any_dtype(values):
+        return values.astype('datetime64[ns]')
+
+    codes, uniques = pd.factorize(values)
+    text = pd.Index(uniques).astype(str)
+    parsed = pd.Series(pd.NaT, index=range(len(text)), dtype='datetime64[ns]')
+    for fmt in DATE_FORMATS:
+        todo = parsed.isna().to_numpy()
+        if not todo.any():
+            break
+        parsed[todo] = pd.to_datetime(text[todo], format=fmt, errors='coerce')
+
+    todo = parsed.isna().to_numpy()
+    if todo.any():
+        parsed[todo] = pd.to_datetime(text[todo], format='mixed', dayfirst=True, errors='coerce')
+
+    # Missing values (code -1) pick the trailing NaT
+    dates = np.append(parsed.to_numpy(), np.datetime64('NaT', 'ns'))[codes]
+    return pd.Series(dates, index=values.index)
+
+def _source_month_starts(sources: pd.Series, default: Optional[str] = None) -> pd.Series:
+    """
+    First day of the 'YYYY-MM' month found in each row's source file name, extracted once per file
+    """
+    codes, files = pd.factorize(sources)
+    months = []
+    for name in files:
+        match = re.search(r'(\d{4}-\d{2})', str(name))
+        months.append(match.group(1) if match else default)
+    starts = pd.to_datetime([f"{m}-01" if m else None for m in months] + [None], errors='coerce')
+    return pd.Series(starts.to_numpy()[codes], index=sources.index)
+
+def build_calendar(days: pd.DatetimeIndex) -> pd.DataFrame:
+    """
+    Calendar dimension: one row per distinct day with month, ISO week and French day label
+    """
+    return pd.DataFrame({
+        'Mois': pd.Categorical(days.strftime('%Y-%m')),
+        'Year': days.year.astype('int16'),
+        'Month': days.month.astype('int8'),
+        'DayOfWeek': pd.Categorical.from_codes(days.dayofweek, categories=DAYS_EN),
+        'Jour': pd.Categorical.from_codes(days.dayofweek, categories=DAYS_FR),
+        'Week': days.isocalendar().week.to_numpy().astype('int8')
+    })
+
+def _add_calendar(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Join calendar columns onto the lines through an integer day key (days since 1970-01-01)
+    """
+    day_keys = df['Date'].to_numpy().astype('datetime64[D]').astype('int64')
+    days, inverse = np.unique(day_keys, return_inverse=True)
+    calendar = build_calendar(pd.DatetimeIndex(days.astype('datetime64[D]')))
+
+    df['DayKey'] = day_keys.astype('int32')
+    for col in calendar.columns:
+        df[col] = calendar[col].take(inverse).set_axis(df.index)
+    return df
+
+# Cache keys of the frames passed to compute_* functions: (dataset version, filter signature)
+# Registered frames hash in microseconds; any other frame falls back to hashing its content
+_FRAME_KEYS: Dict[int, Tuple[weakref.ref, str]] = {}
+
+def register_frame(df: pd.DataFrame, key: str) -> pd.DataFrame:
+    """
+    Record the cache key of a frame for the compute_* caches (dropped with the frame)
+    """
+    _FRAME_KEYS[id(df)] = (weakref.ref(df, lambda ref, frame_id=id(df): _forget_frame(frame_id, ref)), key)
+    return df
+
+def _forget_frame(frame_id: int, ref: weakref.ref) -> None:
+    entry = _FRAME_KEYS.get(frame_id)
+    if entry is not None and entry[0] is ref:
+        del _FRAME_KEYS[frame_id]
+
+def frame_key(df: pd.DataFrame) -> str:
+    """
+    hash_funcs entry for DataFrames: registered key, else a content hash
+    """
+    entry = _FRAME_KEYS.get(id(df))
+    if entry is not None and entry[0]() is df:
+        return entry[1]
+    content = pd.util.hash_pandas_object(df, index=True).to_numpy()
+    return hashlib.blake2b(content.tobytes(), digest_size=16).hexdigest()
+
+FRAME_HASH_FUNCS = {pd.DataFrame: frame_key}
+
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH_FUNCS)
+def compute_abc(df: pd.DataFrame, metric: str) -> pd.DataFrame:
+    """
+    ABC Analysis with Pareto principle
+    """
+    try:
+        agg = df.groupby('Article', observed=True)[metric].sum().reset_index()
+        return _abc_classes(agg, metric)
+    except Exception as e:
+        st.error(f"Error in ABC calculation: {str(e)}")
+        return pd.DataFrame()
+
+def abc_from_partials(articles: pd.DataFrame, metric: str) -> pd.DataFrame:
+    """
+    ABC Analysis from merged per-article partial sums (see build_partials)
+    """
+    try:
+        agg = articles.groupby('Article', observed=True)[metric].sum().reset_index()
+        return _abc_classes(agg, metric)
+    except Exception as e:
+        st.error(f"Error in ABC calculation: {str(e)}")
+        return pd.DataFrame()
+
+def _abc_classes(agg: pd.DataFrame, metric: str) -> pd.DataFrame:
+    """
+    Pareto ranking and A/B/C classes of per-article totals
+    """
+    agg = agg.sort_values(metric, ascending=False)
+
+    total = agg[metric].sum()
+    if total == 0:
+        return agg
+
+    agg['Pct'] = (agg[metric] / total) * 100
+    agg['Cumul'] = agg['Pct'].cumsum()
+    agg['Classe'] = np.select(
+        [agg['Cumul'] <= 80, agg['Cumul'] <= 95],
+        ['A', 'B'],
+        default='C'
+    )
+
+    return agg
+
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH_FUNCS)
+def compute_assoc(df: pd.DataFrame, min_pct: float, k: int = ASSOC_TOP_K) -> Tuple[Optional[pd.DataFrame], int]:
+    """
+    Market Basket Analysis - Product associations (top k pairs)
+    """
+    try:
+        if 'No Op' not in df.columns:
+            return None, 0
+
+        lines = df[df['Nbre Unités'] > 0][['No Op', 'Article']]
+        incidence, labels = basket_incidence(lines, ['No Op'])
+        return top_pairs(cooccurrence(incidence), labels, incidence.shape[0], min_pct, _item_counts(incidence), k)
+
+    except Exception as e:
+        st.error(f"Error in association analysis: {str(e)}")
+        return None, 0
+
+def assoc_from_pairs(
+    pairs: pd.DataFrame,
+    n: int,
+    min_pct: float,
+    items: Optional[pd.DataFrame] = None
+) -> Tuple[Optional[pd.DataFrame], int]:
+    """
+    Top ASSOC_TOP_K product pairs above the minimum support from pair counts over n baskets
+    items (per-article basket counts) adds confidence and lift
+    """
+    if n == 0 or pairs.empty:
+        return None, n
+
+    min_sup = max(2, n * (min_pct / 100))
+    top = pairs.nlargest(ASSOC_TOP_K, 'Fréquence')
+    top = top[top['Fréquence'] >= min_sup].reset_index(drop=True)
+
+    if top.empty:
+        return None, n
+
+    counts = items.set_index('Article')['Paniers'] if items is not None and not items.empty else None
+    if counts is None:
+        top['Support'] = (top['Fréquence'] / n * 100).round(2)
+        return top, n
+    return _rule_metrics(top, counts.reindex(top['Produit A']).to_numpy(), counts.reindex(top['Produit B']).to_numpy(), n), n
+
+def _pair_counts(df: pd.DataFrame, keys: Optional[List[str]] = None) -> Tuple[pd.DataFrame, pd.DataFrame, int]:
+    """
+    Co-occurrence counts of every product pair in multi-article baskets
+    A basket is the set of articles with units > 0 sharing the same keys (default: No Op)
+    Returns: (DataFrame[Produit A, Produit B, Fréquence], DataFrame[Article, Paniers], number of baskets)
+    """
+    keys = keys or ['No Op']
+    return _basket_pair_counts(df[df['Nbre Unités'] > 0][keys + ['Article']], keys)
+
+def _basket_pair_counts(lines: pd.DataFrame, keys: List[str]) -> Tuple[pd.DataFrame, pd.DataFrame, int]:
+    """
+    Pair and per-article basket counts over baskets of already filtered (keys, Article) lines
+    """
+    incidence, labels = basket_incidence(lines, keys)
+    pairs = cooccurrence(incidence)
+    counts = pd.DataFrame({
+        'Produit A': labels.take(pairs.row).to_numpy(dtype=object),
+        'Produit B': labels.take(pairs.col).to_numpy(dtype=object),
+        'Fréquence': pairs.data.astype(np.int64)
+    })
+    item_counts = _item_counts(incidence)
+    present = np.flatnonzero(item_counts)
+    items = pd.DataFrame({
+        'Article': labels.take(present).to_numpy(dtype=object),
+        'Paniers': item_counts[present]
+    })
+    return counts, items, incidence.shape[0]
+
+def _item_counts(incidence: sparse.csr_matrix) -> np.ndarray:
+    """
+    Number of baskets containing each article (column sums of the incidence matrix)
+    """
+    return np.asarray(incidence.sum(axis=0)).ravel().astype(np.int64)
+
+def _rule_metrics(pairs: pd.DataFrame, count_a: np.ndarray, count_b: np.ndarray, n: int) -> pd.DataFrame:
+    """
+    Support, confidence of both rules (A -> B, B -> A) and lift of pair counts over n baskets
+    """
+    freq = pairs['Fréquence'].to_numpy(dtype=float)
+    pairs['Support'] = (freq / n * 100).round(2)
+    pairs['Confiance A→B'] = (freq / count_a * 100).round(1)
+    pairs['Confiance B→A'] = (freq / count_b * 100).round(1)
+    pairs['Lift'] = (freq * n / (count_a * count_b)).round(2)
+    return pairs
+
+def basket_incidence(lines: pd.DataFrame, keys: List[str]) -> Tuple[sparse.csr_matrix, pd.Index]:
+    """
+    Binary basket x article incidence matrix of the multi-article baskets in (keys, Article) lines
+    Columns follow the sorted article labels, so that Produit A < Produit B whatever the partition
+    Returns: (CSR matrix, article labels)
+    """
+    articles = lines['Article'].astype('category')
+    articles = articles.cat.reorder_categories(articles.cat.categories.sort_values())
+    labels = articles.cat.categories
+    basket_ids = lines.groupby(keys, observed=True, sort=False).ngroup().to_numpy()
+
+    incidence = sparse.csr_matrix(
+        (np.ones(len(basket_ids), dtype=np.int32), (basket_ids, articles.cat.codes.to_numpy())),
+        shape=(int(basket_ids.max()) + 1 if len(basket_ids) else 0, len(labels))
+    )
+    incidence.data[:] = 1  # Repeated lines of an article count once
+    return incidence[incidence.getnnz(axis=1) > 1], labels
+
+def cooccurrence(incidence: sparse.csr_matrix) -> sparse.coo_matrix:
+    """
+    Pair co-occurrence counts as the strict upper triangle of X.T @ X (row < column)
+    """
+    counts = sparse.triu(incidence.T.tocsr() @ incidence, k=1).tocoo()
+    return counts
+
+def top_pairs(
+    pairs: sparse.coo_matrix,
+    labels: pd.Index,
+    n: int,
+    min_pct: float,
+    item_counts: np.ndarray,
+    k: int = ASSOC_TOP_K
+) -> Tuple[Optional[pd.DataFrame], int]:
+    """
+    Top k pairs above the minimum support read straight from the sparse counts (see assoc_from_pairs),
+    with confidence and lift from the per-article basket counts
+    """
+    min_sup = max(2, n * (min_pct / 100))
+    keep = np.flatnonzero(pairs.data >= min_sup)
+    if n == 0 or len(keep) == 0:
+        return None, n
+
+    # Partial selection of the k-th largest count, then a full sort of the (few) candidates above it
+    if len(keep) > k:
+        kth = np.partition(pairs.data[keep], len(keep) - k)[len(keep) - k]
+        keep = keep[pairs.data[keep] >= kth]
+    keep = keep[np.lexsort((pairs.col[keep], pairs.row[keep], -pairs.data[keep]))][:k]
+
+    top = pd.DataFrame({
+        'Produit A': labels.take(pairs.row[keep]).to_numpy(dtype=object),
+        'Produit B': labels.take(pairs.col[keep]).to_numpy(dtype=object),
+        'Fréquence': pairs.data[keep].astype(np.int64)
+    })
+    return _rule_metrics(top, item_counts[pairs.row[keep]], item_counts[pairs.col[keep]], n), n
+
+def build_neighbour_index(assoc: pd.DataFrame, k: int = ASSOC_NEIGHBOURS) -> Dict:
+    """
+    Per-article partners of the association pairs in CSR layout: the partners of products[i] are rows
+    indptr[i]:indptr[i + 1] of the score arrays, by decreasing frequency (top k per article)
+    Confiance is read from the article towards its partner
+    """
+    m = len(assoc)
+    products, codes = np.unique(np.r_[assoc['Produit A'].to_numpy(), assoc['Produit B'].to_numpy()].astype(str), return_inverse=True)
+    source = codes
+    partner = np.r_[codes[m:], codes[:m]]
+    scores = {
+        'Fréquence': np.tile(assoc['Fréquence'].to_numpy(), 2),
+        'Support': np.tile(assoc['Support'].to_numpy(), 2),
+        'Confiance': np.r_[assoc['Confiance A→B'].to_numpy(), assoc['Confiance B→A'].to_numpy()],
+        'Lift': np.tile(assoc['Lift'].to_numpy(), 2)
+    }
+
+    order = np.lexsort((partner, -scores['Fréquence'], source))
+    source = source[order]
+    starts = np.searchsorted(source, np.arange(len(products)))
+    keep = np.arange(len(source)) - starts[source] < k
+    order, source = order[keep], source[keep]
+
+    return {
+        'products': pd.Index(products),
+        'indptr': np.searchsorted(source, np.arange(len(products) + 1)),
+        'partners': partner[order],
+        **{name: values[order] for name, values in scores.items()}
+    }
+
+def pair_neighbours(pairs: sparse.coo_matrix, labels: pd.Index, items: np.ndarray, n: int, k: int = ASSOC_NEIGHBOURS) -> Dict:
+    """
+    Neighbour index (see build_neighbour_index) over every counted pair rather than the top pairs
+    """
+    counted = pd.DataFrame({
+        'Produit A': labels.take(pairs.row),
+        'Produit B': labels.take(pairs.col),
+        'Fréquence': pairs.data.astype(np.int64)
+    })
+    return build_neighbour_index(_rule_metrics(counted, items[pairs.row], items[pairs.col], n), k)
+
+def neighbours_of(index: Dict, product: str) -> pd.DataFrame:
+    """
+    Partners of one article with their scores (slice of the neighbour index)
+    """
+    i = index['products'].get_loc(product)
+    rows = slice(index['indptr'][i], index['indptr'][i + 1])
+    related = pd.DataFrame({'Related_Product': index['products'].take(index['partners'][rows])})
+    for name in ['Fréquence', 'Support', 'Confiance', 'Lift']:
+        related[name] = index[name][rows]
+    return related
+
+def association_matrix(assoc: pd.DataFrame, products: List[str], measure: str) -> pd.DataFrame:
+    """
+    Symmetric products x products matrix of one pair measure (0 where the pair is not listed)
+    """
+    position = pd.Index(products)
+    a = position.get_indexer(assoc['Produit A'])
+    b = position.get_indexer(assoc['Produit B'])
+    listed = (a >= 0) & (b >= 0)
+    values = np.zeros((len(products), len(products)), dtype=float)
+    values[a[listed], b[listed]] = assoc[measure].to_numpy()[listed]
+    values[b[listed], a[listed]] = assoc[measure].to_numpy()[listed]
+    return pd.DataFrame(values, index=products, columns=products)
+
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH_FUNCS)
+def compute_itemsets(df: pd.DataFrame, min_pct: float) -> pd.DataFrame:
+    """
+    Frequent itemsets of 3 to ASSOC_MAX_ITEMSET articles (Apriori-style, level by level)
+    """
+    try:
+        if 'No Op' not in df.columns:
+            return pd.DataFrame()
+
+        lines = df[df['Nbre Unités'] > 0][['No Op', 'Article']]
+        incidence, labels = basket_incidence(lines, ['No Op'])
+        return mine_itemsets(incidence, labels, min_pct)
+
+    except Exception as e:
+        st.error(f"Error in itemset mining: {str(e)}")
+        return pd.DataFrame()
+
+def mine_itemsets(
+    incidence: sparse.csr_matrix,
+    labels: pd.Index,
+    min_pct: float,
+    max_size: int = ASSOC_MAX_ITEMSET,
+    k: int = ASSOC_TOP_K
+) -> pd.DataFrame:
+    """
+    Top k itemsets per size from 3 to max_size articles above the minimum support
+    Each level extends the frequent itemsets of the previous one with a larger article code: the baskets
+    holding an itemset are the product of its incidence columns, and one sparse product against the
+    incidence matrix counts every extension at once. Infrequent itemsets are never extended (support
+    pruning), only the ASSOC_FRONTIER most frequent ones are, and baskets larger than ASSOC_MAX_BASKET
+    are skipped so that large B2B orders do not dominate the cost. Support and lift are computed over the
+    baskets actually counted.
+    """
+    matrix = incidence[incidence.getnnz(axis=1) <= ASSOC_MAX_BASKET].tocsc()
+    n = matrix.shape[0]
+    min_sup = max(2, n * (min_pct / 100))
+    item_counts = _item_counts(matrix)
+
+    pairs = sparse.triu(matrix.T @ matrix, k=1).tocoo()
+    frequent = pairs.data >= min_sup
+    itemsets = np.column_stack([pairs.row[frequent], pairs.col[frequent]])
+    counts = pairs.data[frequent]
+
+    results = []
+    for size in range(3, max_size + 1):
+        if len(itemsets) == 0:
+            break
+        if len(itemsets) > ASSOC_FRONTIER:
+            itemsets = itemsets[np.argsort(-counts, kind='stable')[:ASSOC_FRONTIER]]
+
+        holders = matrix[:, itemsets[:, 0]]
+        for j in range(1, itemsets.shape[1]):
+            holders = holders.multiply(matrix[:, itemsets[:, j]]).tocsc()
+        extensions = (holders.T @ matrix).tocoo()
+
+        keep = (extensions.col > itemsets[extensions.row, -1]) & (extensions.data >= min_sup)
+        itemsets = np.column_stack([itemsets[extensions.row[keep]], extensions.col[keep]])
+        counts = extensions.data[keep]
+        if len(itemsets) == 0:
+            break
+
+        top = np.lexsort((*itemsets.T[::-1], -counts))[:k]
+        expected = np.prod(item_counts[itemsets[top]] / n, axis=1) * n
+        results.append(pd.DataFrame({
+            'Articles': [' + '.join(labels.take(row)) for row in itemsets[top]],
+            'Taille': size,
+            'Fréquence': counts[top].astype(np.int64),
+            'Support': (counts[top] / n * 100).round(2),
+            'Lift': (counts[top] / expected).round(2)
+        }))
+
+    return pd.concat(results, ignore_index=True) if results else pd.DataFrame()
+
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH_FUNCS)
+def compute_sku_forecast(
+    cells: pd.DataFrame,
+    metric: str,
+    model: str,
+    horizon: int = 14,
+    by_brand: bool = False
+) -> Tuple[pd.DataFrame, pd.DataFrame, pd.DataFrame]:
+    """
+    Daily forecast of every article (or article x brand) from the cube cells, all series fitted at once
+    Returns: (one row per series sorted by forecast, daily history, daily forecast) - rows aligned
+    """
+    try:
+        keys = ['Article', 'Marque'] if by_brand else ['Article']
+        table, future, fit = forecasting.forecast_table(cells, metric, keys, model, horizon)
+        history = fit['history']
+
+        start = np.datetime64(fit['first_day'], 'D')
+        past_dates = pd.DatetimeIndex(start + np.arange(history.shape[1]))
+        future_dates = pd.DatetimeIndex(start + history.shape[1] + np.arange(horizon))
+
+        table['Moy. 28j'] = history[:, -28:].mean(axis=1).round(1)
+        table['Prévision'] = future.sum(axis=1).round(0)
+        order = np.argsort(-table['Prévision'].to_numpy(), kind='stable')
+
+        return (
+            table.iloc[order].reset_index(drop=True),
+            pd.DataFrame(history[order], columns=past_dates),
+            pd.DataFrame(future[order], columns=future_dates)
+        )
+
+    except Exception as e:
+        st.error(f"Error in SKU forecasting: {str(e)}")
+        return pd.DataFrame(), pd.DataFrame(), pd.DataFrame()
+
+@st.cache_data(show_spinner=False)
+def compute_backtest(version: str, _cells: pd.DataFrame, metric: str, horizon: int, by_brand: bool = False) -> pd.DataFrame:
+    """
+    Rolling-origin backtest of every forecast model over the whole dataset, one origin per monthly file
+    Cached per dataset version (the cells themselves are not hashed)
+    """
+    try:
+        keys = ['Article', 'Marque'] if by_brand else ['Article']
+        _, history, first = forecasting.build_series(_cells, metric, keys)
+        origins = forecasting.month_origins(first, history.shape[1], BACKTEST_MIN_HISTORY, horizon)
+        if not origins:
+            return pd.DataFrame()
+
+        workers = min(BACKTEST_WORKERS, os.cpu_count() or 1) if history.size >= BACKTEST_POOL_MIN_CELLS else 1
+        try:
+            results = forecasting.run_backtest(history, origins, horizon, workers=workers)
+        except Exception as e:
+            st.warning(f"⚠️ Process pool unavailable ({str(e)}), running the backtest sequentially")
+            results = forecasting.run_backtest(history, origins, horizon)
+
+        summary = forecasting.summarize_backtest(results)
+        labels = {model: label for label, model in FORECAST_MODELS.items()}
+        summary['Modèle'] = summary['Modèle'].map(labels)
+        return summary
+
+    except Exception as e:
+        st.error(f"Error in forecast backtest: {str(e)}")
+        return pd.DataFrame()
+
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH_FUNCS)
+def compute_anomalies(orders: pd.DataFrame, _model: Optional[IsolationForest]) -> pd.DataFrame:
+    """
+    Anomaly detection using Isolation Forest, on an order table (see build_order_facts)
+    _model is the dataset's trained model (see anomaly_model): orders are only scored, in one batch
+    """
+    try:
+        if 'No Op' not in orders.columns or _model is None:
+            return pd.DataFrame()
+
+        orders = anomaly_features(orders)
+
+        # Only run if we have enough data
+        if len(orders) < 10:
+            return pd.DataFrame()
+
+        orders['Anomaly'] = _model.predict(orders[ANOMALY_FEATURES].to_numpy())
+
+        # Severity score
+        orders['Score'] = (
+            (orders['Volume'] / orders['Volume'].mean()) +
+            (orders['Lignes'] / orders['Lignes'].mean())
+        )
+        anomalies = orders[orders['Anomaly'] == -1]
+
+        if len(anomalies) == 0:
+            return pd.DataFrame()
+
+        return anomalies.sort_values('Score', ascending=False)
+
+    except Exception as e:
+        st.error(f"Error in anomaly detection: {str(e)}")
+        return pd.DataFrame()
+
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH_FUNCS)
+def compute_clustering(df: pd.DataFrame, _models: Optional[Dict] = None) -> pd.DataFrame:
+    """
+    Product clustering for strategic placement (mini-batch K-Means on CLUSTER_FEATURES)
+    _models is the dataset's model store: each run starts from the centroids of the previous one,
+    so that a filter change only refines the segmentation
+    """
+    try:
+        stats = sku_features(df)
+
+        if len(stats) < 3:
+            return stats
+
+        # Normalization
+        scaler = StandardScaler()
+        X = scaler.fit_transform(stats[CLUSTER_FEATURES].to_numpy(dtype=float))
+
+        # Mini-batch K-Means, warm-started from the previous centroids
+        n_clusters = min(CLUSTER_COUNT, len(stats))
+        previous = (_models or {}).get('clusters')
+        warm = previous is not None and previous.shape == (n_clusters, X.shape[1])
+        kmeans = MiniBatchKMeans(
+            n_clusters=n_clusters,
+            init=previous if warm else 'k-means++',
+            n_init=1 if warm else 3,
+            batch_size=CLUSTER_BATCH_SIZE,
+            random_state=42
+        )
+        stats['Cluster'] = kmeans.fit_predict(X)
+        if _models is not None:
+            _models['clusters'] = kmeans.cluster_centers_
+
+        # Label clusters
+        cluster_avg = stats.groupby('Cluster')['Frequence'].mean().sort_values(ascending=False)
+        mapping = {old: new for new, old in enumerate(cluster_avg.index)}
+
+        labels = {
+            0: '🥇 Gold (Hot Zone)',
+            1: '🥈 Silver (Warm Zone)',
+            2: '🥉 Bronze (Cold Zone)'
+        }
+
+        stats['Cluster_Label'] = stats['Cluster'].map(mapping).map(labels)
+
+        return stats
+
+    except Exception as e:
+        st.error(f"Error in clustering: {str(e)}")
+        return pd.DataFrame()
+
+def sku_features(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Clustering features of every article in one pass of bincounts over the lines:
+    volume, orders, lines, packages, weekday spread (normalized entropy of its lines over the weekdays)
+    and share of lines picked in full PCB multiples
+    """
+    article, labels = pd.factorize(df['Article'], sort=True)
+    n = len(labels)
+    units = df['Nbre Unités'].to_numpy(dtype=float)
+
+    # Distinct orders per article (lines without order id are not counted)
+    order = pd.factorize(df['No Op'])[0].astype(np.int64)
+    width = order.max() + 1 if len(order) else 1
+    pairs = pd.unique(article[order >= 0].astype(np.int64) * width + order[order >= 0])
+    orders = np.bincount(pairs // width, minlength=n)
+
+    # Lines per article and weekday
+    weekday = pd.Categorical(df['DayOfWeek'], categories=DAYS_EN).codes.astype(np.int64)
+    by_day = np.bincount(article * 7 + np.where(weekday >= 0, weekday, 0), minlength=n * 7).reshape(n, 7)
+    lines = by_day.sum(axis=1)
+    share = by_day / np.maximum(lines, 1)[:, None]
+    entropy = -(share * np.log(np.where(share > 0, share, 1))).sum(axis=1) / np.log(7)
+
+    full_pcb = _package_multiple(units, df['PCB'] if 'PCB' in df.columns else None)
+
+    colis = df['Nbre Colis'].to_numpy(dtype=float) if 'Nbre Colis' in df.columns else np.zeros(len(df))
+    return pd.DataFrame({
+        'Article': labels,
+        'Volume': np.bincount(article, weights=np.nan_to_num(units), minlength=n),
+        'Frequence': orders,
+        'Lignes': lines,
+        'Colis': np.bincount(article, weights=np.nan_to_num(colis), minlength=n),
+        'Étalement Semaine': entropy.round(3),
+        'Part PCB': (np.bincount(article, weights=full_pcb, minlength=n) / np.maximum(lines, 1)).round(3)
+    })
+
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH_FUNCS)
+def compute_global_kpis(orders: pd.DataFrame) -> Dict:
+    """
+    Global KPIs for operational overview, from an order table (see build_order_table / build_order_facts)
+    """
+    try:
+        orders = orders_by_id(orders)
+        lines_per_order = orders['Lignes']
+        total_orders = len(orders)
+        mono_orders = int((lines_per_order == 1).sum())
+        total_units = orders['Nbre Unités'].sum()
+        total_colis = orders['Nbre Colis'].sum()
+
+        return {
+            'pct_mono': (mono_orders / total_orders * 100) if total_orders > 0 else 0,
+            'total_orders': total_orders,
+            'mono_orders': mono_orders,
+            'density': (total_units / total_colis) if total_colis > 0 else 0,
+            'avg_lines': lines_per_order.mean() if total_orders > 0 else 0,
+            'median_lines': lines_per_order.median() if total_orders > 0 else 0,
+            'total_units': total_units,
+            'total_colis': total_colis
+        }
+
+    except Exception as e:
+        st.error(f"Error computing KPIs: {str(e)}")
+        return {}
+
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH_FUNCS)
+def compute_geo_data(cells: pd.DataFrame, members: pd.DataFrame) -> pd.DataFrame:
+    """
+    Geographic analysis from the cube: measures from its cells, distinct orders from its order memberships
+    """
+    try:
+        if 'Pays' not in cells.columns:
+            return pd.DataFrame()
+
+        geo = cells.groupby('Pays', observed=True).agg({
+            'Nbre Unités': 'sum',
+            'Nbre Colis': 'sum'
+        })
+        geo['Commandes'] = members.groupby('Pays', observed=True)['No Op'].nunique()
+        geo = geo.reset_index()[['Pays', 'Nbre Unités', 'Commandes', 'Nbre Colis']]
+
+        geo.columns = ['Pays', 'Unités', 'Commandes', 'Colis']
+        geo = geo.sort_values('Unités', ascending=False)
+
+        return geo
+
+    except Exception as e:
+        st.error(f"Error in geo analysis: {str(e)}")
+        return pd.DataFrame()
+
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH_FUNCS)
+def compute_quality_metrics(df: pd.DataFrame) -> Tuple[float, pd.DataFrame]:
+    """
+    Quality and service level metrics
+    """
+    try:
+        if 'Quantité préparée' in df.columns and df['Quantité préparée'].sum() > 0:
+            total_ordered = df['Nbre Unités'].sum()
+            total_prepared = df['Quantité préparée'].sum()
+            service_rate = (total_prepared / total_ordered * 100) if total_ordered > 0 else 100
+
+            # Stockouts
+            cuts = df[df['Quantité préparée'] < df['Nbre Unités']].copy()
+            cuts['Manquant'] = cuts['Nbre Unités'] - cuts['Quantité préparée']
+
+            top_cuts = cuts.groupby('Article', observed=True)['Manquant'].sum().reset_index()
+            top_cuts = top_cuts.sort_values('Manquant', ascending=False).head(20)
+        else:
+            service_rate = 98.5
+            top_cuts = pd.DataFrame()
+
+        return service_rate, top_cuts
+
+    except Exception as e:
+        st.error(f"Error in quality metrics: {str(e)}")
+        return 0.0, pd.DataFrame()
+
+# =============================================================================
+# PERSISTENT DATASET CACHE
+# =============================================================================
+
+def _cache_dir(folder: str) -> Path:
+    """
+    Cache directory for a data folder: <parent>/.wms_cache/<folder name>
+    """
+    path = Path(folder).resolve()
+    return path.parent / CACHE_DIR_NAME / path.name
+
+
+def _hash_file(file: Path, chunk_size: int = 1 << 20) -> str:
+    """
+    Content hash of a file, read in 1 MB chunks
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    with open(file, 'rb') as f:
+        for chunk in iter(lambda: f.read(chunk_size), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _source_fingerprints(files: List[Path], known: Dict[str, Dict]) -> List[Dict]:
+    """
+    Fingerprint source files by name, size, mtime and content hash
+    The hash of a file whose size and mtime match the previous manifest is reused instead of re-read
+    """
+    fingerprints = []
+    for file in files:
+        stat = file.stat()
+        previous = known.get(file.name)
+        if previous and previous['size'] == stat.st_size and previous['mtime_ns'] == stat.st_mtime_ns:
+            content_hash = previous['hash']
+        else:
+            content_hash = _hash_file(file)
+
+        fingerprints.append({
+            'name': file.name,
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'hash': content_hash
+        })
+    return fingerprints
+
+
+def _cache_params(months: Optional[Tuple[str, ...]], plan: Optional[Dict] = None) -> Dict:
+    """
+    Load parameters the cached partitions depend on
+    """
+    return {
+        'format': CACHE_FORMAT_VERSION,
+        'months': sorted(months) if months else None,
+        'brands': sorted(VALID_BRANDS),
+        'columns': list(plan['columns']) if plan else LOAD_COLUMNS,
+        'sample_fraction': plan['sample_fraction'] if plan else None
+    }
+
+
+def _read_manifest(cache_dir: Path) -> Dict:
+    try:
+        with open(cache_dir / 'manifest.json', 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def _write_manifest(cache_dir: Path, manifest: Dict) -> None:
+    tmp = cache_dir / 'manifest.json.tmp'
+    with open(tmp, 'w', encoding='utf-8') as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp, cache_dir / 'manifest.json')
+
+
+def _write_feather(df: pd.DataFrame, target: Path) -> None:
+    """
+    Write a DataFrame as Feather through a temporary file swapped in atomically
+    """
+    tmp = target.with_name(target.name + '.tmp')
+    feather.write_feather(df.reset_index(drop=True), tmp)
+    os.replace(tmp, target)
+
+
+def _read_feather(source: Path) -> pd.DataFrame:
+    return feather.read_table(source, memory_map=True).to_pandas()
+
+
+def _concat_parts(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    """
+    Concatenate cleaned partitions, unioning categories so categorical columns stay categorical
+    """
+    frames = [f for f in frames if not f.empty]
+    if not frames:
+        return pd.DataFrame()
+    if len(frames) == 1:
+        return frames[0]
+
+    for col in frames[0].columns:
+        if all(col in f.columns and isinstance(f[col].dtype, pd.CategoricalDtype) for f in frames):
+            if all(f[col].cat.categories.equals(frames[0][col].cat.categories) for f in frames):
+                continue  # Shared categories (calendar labels) keep their order
+            categories = pd.api.types.union_categoricals([f[col] for f in frames], sort_categories=True).categories
+            for f in frames:
+                f[col] = f[col].cat.set_categories(categories)
+
+    return pd.concat(frames, ignore_index=True, sort=False)
+
+
+def build_order_table(df: pd.DataFrame, keys: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    One row per order (No Op) - or per keys - with its date, brand, country, line count and summed quantities
+    """
+    keys = keys or ['No Op']
+    aggs = {
+        'Date': ('Date', 'min'),
+        'Marque': ('Marque', 'first'),
+        'Lignes': ('Article', 'count'),
+        'Nbre Unités': ('Nbre Unités', 'sum'),
+        'Nbre Colis': ('Nbre Colis', 'sum')
+    }
+    if 'Pays' in df.columns:
+        aggs['Pays'] = ('Pays', 'first')
+    if 'Quantité préparée' in df.columns:
+        aggs['Quantité préparée'] = ('Quantité préparée', 'sum')
+    for key in keys:
+        aggs.pop(key, None)
+
+    return df.groupby(keys, observed=True, sort=False).agg(**aggs).reset_index()
+
+
+def build_partials(df: pd.DataFrame, pairs: bool = True) -> Dict:
+    """
+    Mergeable aggregates of a cleaned partition:
+    per-article sums (ABC), order table (KPIs), pair co-occurrence and per-article basket counts (associations)
+    """
+    measures = [c for c in ['Nbre Unités', 'Quantité préparée', 'Nbre Colis'] if c in df.columns]
+    articles = df.groupby(['Article', 'Mois', 'Marque'], observed=True, sort=False)[measures].sum()
+    articles['Lignes'] = df.groupby(['Article', 'Mois', 'Marque'], observed=True, sort=False).size()
+
+    has_orders = 'No Op' in df.columns
+    pair_counts, items, baskets = _pair_counts(df) if (pairs and has_orders) else (pd.DataFrame(), pd.DataFrame(), 0)
+
+    return {
+        'articles': articles.reset_index(),
+        'orders': build_order_table(df) if has_orders else pd.DataFrame(),
+        'pairs': pair_counts,
+        'items': items,
+        'baskets': baskets
+    }
+
+
+def _merge_articles(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    articles = _concat_parts(frames)
+    return articles.groupby(['Article', 'Mois', 'Marque'], observed=True, sort=False).sum().reset_index()
+
+
+def _merge_orders(frames: List[pd.DataFrame], keys: Optional[List[str]] = None) -> pd.DataFrame:
+    """
+    Combine order tables (see build_order_table), re-aggregating orders - or keys - present in several of them
+    """
+    keys = keys or ['No Op']
+    orders = _concat_parts(frames)
+    if not set(keys) <= set(orders.columns) or not orders.duplicated(keys).any():
+        return orders
+
+    aggs = {c: 'sum' for c in orders.columns if c not in keys + ['Date', 'Marque', 'Pays']}
+    aggs.update({c: 'first' for c in ['Marque', 'Pays'] if c in orders.columns and c not in keys})
+    aggs['Date'] = 'min'
+    return orders.groupby(keys, observed=True, sort=False).agg(aggs).reset_index()
+
+
+def _merge_pairs(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    pairs = pd.concat(frames, ignore_index=True)
+    if pairs.empty:
+        return pairs
+    pairs = pairs.groupby(['Produit A', 'Produit B'], sort=False)['Fréquence'].sum().reset_index()
+    return pairs[pairs['Fréquence'] > 0].reset_index(drop=True)
+
+
+def _merge_items(frames: List[pd.DataFrame]) -> pd.DataFrame:
+    items = pd.concat(frames, ignore_index=True)
+    if items.empty:
+        return items
+    items = items.groupby('Article', sort=False)['Paniers'].sum().reset_index()
+    return items[items['Paniers'] > 0].reset_index(drop=True)
+
+
+def merge_partials(partials: List[Dict], df: pd.DataFrame) -> Dict:
+    """
+    Combine per-partition aggregates into dataset-wide aggregates
+    Orders split across partitions are re-aggregated; their pair counts are recomputed from the lines
+    """
+    orders = [p['orders'] for p in partials]
+    pairs = [p['pairs'] for p in partials]
+    items = [p['items'] for p in partials]
+    baskets = sum(p['baskets'] for p in partials)
+
+    all_orders = pd.concat(orders, ignore_index=True)
+    if 'No Op' in all_orders.columns:
+        spanning = all_orders.loc[all_orders['No Op'].duplicated(), 'No Op'].unique()
+        if len(spanning):
+            # Swap per-partition baskets of split orders for whole-order baskets
+            lines = df[df['No Op'].isin(spanning)]
+            split_pairs, split_items, split_baskets = _pair_counts(lines, ['No Op', '_Source'])
+            joined_pairs, joined_items, joined_baskets = _pair_counts(lines)
+            split_pairs['Fréquence'] = -split_pairs['Fréquence']
+            split_items['Paniers'] = -split_items['Paniers']
+            pairs += [split_pairs, joined_pairs]
+            items += [split_items, joined_items]
+            baskets += joined_baskets - split_baskets
+
+    return {
+        'articles': _merge_articles([p['articles'] for p in partials]),
+        'orders': _merge_orders(orders),
+        'pairs': _merge_pairs(pairs),
+        'items': _merge_items(items),
+        'baskets': baskets
+    }
+
+
+def load_dataset(
+    folder: str,
+    months: Optional[Tuple[str, ...]] = None,
+    force: bool = False,
+    plan: Optional[Dict] = None
+) -> Tuple[Optional[pd.DataFrame], Optional[Dict], Optional[str]]:
+    """
+    Cleaned dataset and merged aggregates for a folder, maintained incrementally in the persistent cache
+    Each source file is cached as a cleaned partition with its partial aggregates; only new or
+    changed files are loaded and cleaned, deleted files are dropped. plan comes from plan_load.
+    The aggregates also list the source files read ('files', name -> hash) and the file(s) each order
+    comes from ('sources', see score_new_orders).
+    Returns: (DataFrame, Aggregates, Error Message)
+    """
+    path = Path(folder)
+    if not path.exists():
+        return None, None, f"⚠️ Directory not found: {folder}"
+
+    files = sorted(path.glob("*.parquet"))
+    if not files:
+        return None, None, "⚠️ No Parquet files found in directory."
+
+    cache_dir = _cache_dir(folder)
+    parts_dir = cache_dir / 'parts'
+    manifest = _read_manifest(cache_dir)
+    params = _cache_params(months, plan)
+    previous = manifest.get('parts', {})
+    fingerprints = _source_fingerprints(files, previous)
+
+    # Partitions whose source file is unchanged can be reused as-is
+    reusable = previous if (not force and manifest.get('params') == json.loads(json.dumps(params))) else {}
+    changed = [
+        fp['name'] for fp in fingerprints
+        if not (
+            fp['name'] in reusable
+            and reusable[fp['name']]['size'] == fp['size']
+            and reusable[fp['name']]['hash'] == fp['hash']
+            and (reusable[fp['name']]['rows'] == 0 or (parts_dir / f"{Path(fp['name']).stem}.feather").exists())
+        )
+    ]
+
+    fresh = {}
+    error = None
+    if changed:
+        raw, error = load_data(
+            folder,
+            months=months,
+            files=tuple(changed),
+            columns=plan['columns'] if plan else None,
+            categorical=plan['categorical'] if plan else (),
+            sample_fraction=plan['sample_fraction'] if plan else None
+        )
+        if error and len(changed) == len(fingerprints):
+            return None, None, error
+        if error:
+            st.warning(error)
+        else:
+            cleaned = clean_data(raw)
+            if not cleaned.empty:
+                for name, part in cleaned.groupby('_Source', observed=True, sort=False):
+                    fresh[name] = part.reset_index(drop=True)
+
+    frames, partials, sources = [], [], []
+    entries = {}
+    for fp in fingerprints:
+        name = fp['name']
+        stem = Path(name).stem
+
+        if name in changed:
+            if name not in fresh:
+                if error:
+                    continue  # Unreadable this time: retried on next refresh
+                entries[name] = {**fp, 'rows': 0, 'baskets': 0}
+                continue
+
+            part = fresh[name]
+            partial = build_partials(part)
+            try:
+                parts_dir.mkdir(parents=True, exist_ok=True)
+                _write_feather(part, parts_dir / f"{stem}.feather")
+                for kind in PARTIAL_KINDS:
+                    _write_feather(partial[kind], parts_dir / f"{stem}.{kind}.feather")
+            except Exception as e:
+                st.warning(f"⚠️ Could not write cache for {name}: {str(e)[:50]}")
+                continue
+            entries[name] = {**fp, 'rows': len(part), 'baskets': partial['baskets']}
+        else:
+            entries[name] = {**reusable[name], 'mtime_ns': fp['mtime_ns']}
+            if entries[name]['rows'] == 0:
+                continue
+            try:
+                part = _read_feather(parts_dir / f"{stem}.feather")
+                partial = {kind: _read_feather(parts_dir / f"{stem}.{kind}.feather") for kind in PARTIAL_KINDS}
+                partial['baskets'] = entries[name]['baskets']
+            except Exception as e:
+                st.warning(f"⚠️ Cache illisible pour {name}, rechargement au prochain rafraîchissement: {str(e)[:50]}")
+                entries.pop(name)
+                continue
+
+        frames.append(part)
+        partials.append(partial)
+        if 'No Op' in partial['orders'].columns:
+            sources.append(pd.DataFrame({'No Op': partial['orders']['No Op'].astype(str), '_Source': name}))
+
+    # Drop partitions of deleted source files
+    for name in set(previous) - {fp['name'] for fp in fingerprints}:
+        for target in parts_dir.glob(f"{Path(name).stem}.*feather"):
+            target.unlink(missing_ok=True)
+
+    if not frames:
+        return pd.DataFrame(), None, None
+
+    df = _concat_parts(frames)
+    aggregates = merge_partials(partials, df)
+    aggregates['files'] = {name: entry['hash'] for name, entry in entries.items()}
+    aggregates['sources'] = pd.concat(sources, ignore_index=True) if sources else pd.DataFrame(columns=['No Op', '_Source'])
+
+    try:
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        _write_manifest(cache_dir, {
+            'params': params,
+            'parts': entries,
+            'rows': len(df),
+            'updated': datetime.now().isoformat(timespec='seconds')
+        })
+    except Exception as e:
+        st.warning(f"⚠️ Could not write dataset cache: {str(e)[:50]}")
+
+    reused = len(frames) - len([n for n in changed if n in fresh])
+    st.info(f"⚡ {reused} fichier(s) depuis le cache, {len(changed)} nouveau(x) ou modifié(s) - {len(df):,} lignes")
+
+    return df, aggregates, None
+
+def stream_aggregates(
+    folder: str,
+    months: Optional[Tuple[str, ...]] = None,
+    force: bool = False
+) -> Tuple[Optional[Dict], Optional[str]]:
+    """
+    Exact dataset-wide aggregates (see build_partials) computed out of core, without sampling
+    Files are decoded batch by batch; article and order partials, cube tables (see cube_tables) and order
+    facts are merged as batches arrive, and baskets are spilled to hash buckets by No Op so that pair
+    counts and pair partials (see build_pair_partials) run on complete orders one bucket at a time.
+    The basket lines are kept per month for the date-cut months of the pair partials. Results are
+    cached on disk next to the cleaned partitions; the filtered views are under aggregates['stream'],
+    'files' and 'sources' are listed as in load_dataset.
+    Returns: (Aggregates, Error Message)
+    """
+    path = Path(folder)
+    files = sorted(path.glob("*.parquet")) if path.exists() else []
+    if not files:
+        return None, f"⚠️ No Parquet files found in {folder}"
+
+    cache_dir = _cache_dir(folder)
+    stream_dir = cache_dir / 'stream'
+    lines_dir = stream_dir / 'lines'
+    manifest = _read_manifest(stream_dir)
+    fingerprints = _source_fingerprints(files, {fp['name']: fp for fp in manifest.get('files', [])})
+    key = json.loads(json.dumps({
+        'params': _cache_params(months),
+        'files': [(fp['name'], fp['size'], fp['hash']) for fp in fingerprints]
+    }))
+
+    if not force and manifest.get('key') == key:
+        try:
+            aggregates = {kind: _read_feather(stream_dir / f"{kind}.feather") for kind in PARTIAL_KINDS}
+            aggregates['baskets'] = manifest['baskets']
+            aggregates['files'] = manifest['streamed']
+            aggregates['sources'] = _read_feather(stream_dir / 'sources.feather')
+            pair_partials = joblib.load(stream_dir / 'pair_partials.joblib')
+            pair_partials['read_lines'] = functools.partial(_stream_lines, lines_dir, pair_partials['labels'])
+            pair_partials['spanning'], pair_partials['spanning_index'] = build_filter_index(pair_partials['spanning'])
+            aggregates['stream'] = {
+                'cells': _read_feather(stream_dir / 'cube_cells.feather'),
+                'members': _read_feather(stream_dir / 'cube_members.feather'),
+                'facts': _read_feather(stream_dir / 'facts.feather'),
+                'pairs': pair_partials
+            }
+            return aggregates, None
+        except Exception:
+            pass  # Recompute below
+
+    articles, orders, cube, facts = None, None, None, None
+    sources = pd.DataFrame(columns=['No Op', '_Source'])
+    rows, failed_files, failed_names = 0, [], set()
+    progress_bar = st.progress(0)
+    status_text = st.empty()
+    spill_schema = pa.schema([
+        ('No Op', pa.string()), ('Article', pa.string()), ('Mois', pa.string()),
+        ('Marque', pa.string()), ('DayKey', pa.int32())
+    ])
+
+    try:
+        with tempfile.TemporaryDirectory(prefix='wms_stream_') as spill_dir:
+            spill_paths = [Path(spill_dir) / f"bucket_{b}.arrow" for b in range(STREAM_BUCKETS)]
+            writers = [pa.ipc.new_file(p, spill_schema) for p in spill_paths]
+
+            try:
+                for i, file in enumerate(files):
+                    status_text.text(f"Streaming {file.name}... ({i+1}/{len(files)})")
+                    try:
+                        schema = pq.read_schema(file)
+                        columns = _parquet_projection(schema.names)
+                        filters = _parquet_filters(schema, columns, file.name, months)
+                        batches = ds.dataset(file, format='parquet').to_batches(
+                            columns=list(columns), filter=filters, batch_size=STREAM_BATCH_ROWS
+                        )
+
+                        for batch in batches:
+                            df = _normalize_columns(batch.to_pandas(), columns, file.name)
+                            df = clean_data(df, verbose=False)
+                            if df.empty:
+                                continue
+
+                            rows += len(df)
+                            partial = build_partials(df, pairs=False)
+                            articles = _merge_articles([a for a in [articles, partial['articles']] if a is not None])
+                            orders = _merge_orders([o for o in [orders, partial['orders']] if o is not None])
+                            df['Mode Picking'] = picking_modes(df)
+                            cube = merge_cube_tables([t for t in [cube, cube_tables(df)] if t is not None])
+
+                            # Spill baskets: every line of an order lands in the same bucket
+                            if 'No Op' in df.columns:
+                                batch_facts = build_order_table(df, keys=FACT_KEYS)
+                                facts = _merge_orders([f for f in [facts, batch_facts] if f is not None], FACT_KEYS)
+                                batch_sources = df[['No Op', '_Source']].drop_duplicates().astype(str)
+                                sources = pd.concat([sources, batch_sources], ignore_index=True).drop_duplicates()
+                                lines = df.loc[df['Nbre Unités'] > 0, ['No Op', 'Article', 'Mois', 'Marque', 'DayKey']]
+                                lines = lines.astype({'No Op': str, 'Article': str, 'Mois': str, 'Marque': str})
+                                buckets = pd.util.hash_pandas_object(lines['No Op'], index=False).to_numpy() % STREAM_BUCKETS
+                                for b in np.unique(buckets):
+                                    table = pa.Table.from_pandas(lines[buckets == b], preserve_index=False)
+                                    writers[b].write_table(table.cast(spill_schema))
+
+                    except MemoryError:
+                        raise
+                    except Exception as e:
+                        failed_files.append(f"{file.name} ({str(e)[:50]})")
+                        failed_names.add(file.name)
+
+                    progress_bar.progress((i + 1) / (len(files) + 1))
+            finally:
+                for writer in writers:
+                    writer.close()
+
+            # Pair counts bucket by bucket: buckets hold disjoint, complete orders
+            status_text.text("Comptage des associations...")
+            pairs, items, baskets = pd.DataFrame(), pd.DataFrame(), 0
+            labels = pd.Index(sorted(articles['Article'].astype(str).unique())) if articles is not None else pd.Index([])
+            cells, spanning, bounds = {}, [], []
+            month_writers = {}
+            for target in lines_dir.glob('*.arrow'):
+                target.unlink()
+            lines_dir.mkdir(parents=True, exist_ok=True)
+
+            try:
+                for spill_path in spill_paths:
+                    with pa.OSFile(str(spill_path)) as source:
+                        table = pa.ipc.open_file(source).read_all()
+                    lines = table.to_pandas()
+                    bucket_pairs, bucket_items, bucket_baskets = _basket_pair_counts(lines, ['No Op'])
+                    pairs = _merge_pairs([pairs, bucket_pairs])
+                    items = _merge_items([items, bucket_items])
+                    baskets += bucket_baskets
+
+                    lines['Article'] = pd.Categorical(lines['Article'], categories=labels)
+                    bucket_cells, bucket_spanning = _pair_partition_tables(lines)
+                    for partition, counts in bucket_cells.items():
+                        cells[partition] = _sum_partition_counts([c for c in [cells.get(partition), counts] if c is not None], len(labels))
+                    spanning.append(bucket_spanning)
+                    bounds.append(lines.groupby('Mois', sort=False)['DayKey'].agg(['min', 'max']))
+
+                    # Basket lines per month, read back for the months cut by a date filter
+                    for month, rows_of_month in lines.groupby('Mois', sort=False).indices.items():
+                        if month not in month_writers:
+                            month_writers[month] = pa.ipc.new_file(lines_dir / f"{month}.arrow", spill_schema)
+                        month_writers[month].write_table(table.take(rows_of_month))
+            finally:
+                for writer in month_writers.values():
+                    writer.close()
+
+    except MemoryError:
+        return None, "⚠️ Memory error during streaming. Reduce STREAM_BATCH_ROWS."
+    finally:
+        progress_bar.empty()
+        status_text.empty()
+
+    if failed_files:
+        st.warning(f"⚠️ Could not stream {len(failed_files)} file(s): {', '.join(failed_files[:3])}")
+    if articles is None:
+        return None, "⚠️ Could not read any files in streaming mode."
+
+    spanning = pd.concat(spanning, ignore_index=True)
+    spanning['Date'] = spanning['DayKey'].to_numpy().astype('datetime64[D]').astype('datetime64[ns]')
+    bounds = pd.concat(bounds).groupby(level=0).agg({'min': 'min', 'max': 'max'})
+    pair_partials = _finish_pair_partials({
+        'labels': labels,
+        'months': {month: (int(row['min']), int(row['max'])) for month, row in bounds.iterrows()},
+        'read_lines': functools.partial(_stream_lines, lines_dir, labels),
+        'cells': cells,
+        'spanning': spanning
+    })
+    cells, members = cube
+    aggregates = {
+        'articles': articles, 'orders': orders, 'pairs': pairs, 'items': items, 'baskets': baskets,
+        'files': {fp['name']: fp['hash'] for fp in fingerprints if fp['name'] not in failed_names},
+        'sources': sources.reset_index(drop=True),
+        'stream': {'cells': cells, 'members': members, 'facts': facts, 'pairs': pair_partials}
+    }
+
+    try:
+        stream_dir.mkdir(parents=True, exist_ok=True)
+        for kind in PARTIAL_KINDS:
+            _write_feather(aggregates[kind], stream_dir / f"{kind}.feather")
+        _write_feather(cells, stream_dir / 'cube_cells.feather')
+        _write_feather(members, stream_dir / 'cube_members.feather')
+        _write_feather(facts, stream_dir / 'facts.feather')
+        _write_feather(aggregates['sources'], stream_dir / 'sources.feather')
+        joblib.dump(
+            {name: pair_partials[name] for name in ['labels', 'months', 'cells', 'spanning', 'neighbours']},
+            stream_dir / 'pair_partials.joblib'
+        )
+        _write_manifest(stream_dir, {
+            'key': key, 'files': fingerprints, 'streamed': aggregates['files'], 'baskets': baskets, 'rows': rows
+        })
+    except Exception as e:
+        st.warning(f"⚠️ Could not write streaming cache: {str(e)[:50]}")
+
+    st.success(f"✅ Streaming : {rows:,} lignes agrégées sans échantillonnage")
+    return aggregates, None
+
+# =============================================================================
+# SHARED DATASET
+# =============================================================================
+
+@st.cache_resource
+def _dataset_registry() -> Dict:
+    """
+    Process-wide registry of loaded datasets: one read-only copy per version, shared by all sessions
+    versions: version -> {'data', 'aggregates', 'meta', 'refs'}; current: source key -> latest version
+    scoring_lock serializes the online anomaly scoring of new orders (see score_new_orders)
+    """
+    return {'lock': threading.Lock(), 'scoring_lock': threading.Lock(), 'versions': {}, 'current': {}, 'counter': 0}
+
+
+class DatasetHandle:
+    """
+    Session-side reference to a shared dataset version
+    The reference is released when the handle is released or garbage collected with its session
+    """
+
+    def __init__(self, version: str):
+        self.version = version
+        self.release = weakref.finalize(self, _release_dataset, version)
+
+
+def dataset_signature(folder: str, months: Optional[Tuple[str, ...]], plan: Optional[Dict] = None) -> str:
+    """
+    Cheap identity of what a refresh would load: load parameters plus source file names, sizes and mtimes
+    """
+    path = Path(folder)
+    files = sorted(path.glob("*.parquet")) if path.exists() else []
+    stats = [(f.name, f.stat().st_size, f.stat().st_mtime_ns) for f in files]
+    payload = json.dumps({'params': _cache_params(months, plan), 'files': stats}, sort_keys=True, default=str)
+    return hashlib.blake2b(payload.encode('utf-8'), digest_size=8).hexdigest()
+
+
+def publish_dataset(source: str, signature: str, data: pd.DataFrame, aggregates: Optional[Dict], meta: Dict) -> DatasetHandle:
+    """
+    Register a loaded dataset as the current version for its source folder and return a handle on it
+    The frame is sorted by date and indexed for filtering (see build_filter_index), and gets the
+    'Mode Picking' of every line (see picking_modes), which is also a cube dimension. Cube, order facts
+    and pair partials come from the streamed aggregates when there are some (the frame is then only a
+    sample), else from the frame.
+    The version it replaces is dropped as soon as no session holds it any more, and the anomaly models
+    of versions no longer registered are deleted (see prune_anomaly_models)
+    """
+    data, index = build_filter_index(data)
+    data['Mode Picking'] = picking_modes(data)
+    stream = aggregates.get('stream') if aggregates else None
+    if stream:
+        cube = index_cube(stream['cells'], stream['members'])
+        orders, orders_index = build_filter_index(_with_calendar(stream['facts']))
+        pairs = stream['pairs']
+    else:
+        cube = build_cube(data)
+        orders, orders_index = build_order_facts(data)
+        pairs = build_pair_partials(data, index)
+    registry = _dataset_registry()
+    with registry['lock']:
+        registry['counter'] += 1
+        version = f"{signature}-{registry['counter']}"
+        registry['versions'][version] = {
+            'data': data,
+            'index': index,
+            'cube': cube,
+            'orders': orders,
+            'orders_index': orders_index,
+            'pairs': pairs,
+            'aggregates': aggregates,
+            'models': {},
+            'models_lock': threading.Lock(),
+            'meta': {**meta, 'source': source, 'signature': signature},
+            'refs': 0
+        }
+        previous = registry['current'].get(source)
+        registry['current'][source] = version
+        if previous in registry['versions'] and registry['versions'][previous]['refs'] == 0:
+            del registry['versions'][previous]
+        live = _live_signatures(registry, source)
+    prune_anomaly_models(source, live)
+    return acquire_dataset(version)
+
+
+def acquire_dataset(version: str) -> Optional[DatasetHandle]:
+    """
+    New handle on a registered version, or None if it is gone
+    """
+    registry = _dataset_registry()
+    with registry['lock']:
+        entry = registry['versions'].get(version)
+        if entry is None:
+            return None
+        entry['refs'] += 1
+    return DatasetHandle(version)
+
+
+def _release_dataset(version: str) -> None:
+    registry = _dataset_registry()
+    with registry['lock']:
+        entry = registry['versions'].get(version)
+        if entry is None:
+            return
+        entry['refs'] -= 1
+        source = entry['meta']['source']
+        if entry['refs'] > 0 or registry['current'].get(source) == version:
+            return
+        del registry['versions'][version]
+        live = _live_signatures(registry, source)
+    prune_anomaly_models(source, live)
+
+
+def current_dataset(source: str, signature: Optional[str] = None) -> Optional[str]:
+    """
+    Current version for a source folder (matching signature when given), or None
+    """
+    registry = _dataset_registry()
+    with registry['lock']:
+        version = registry['current'].get(source)
+        if version is None:
+            return None
+        if signature is not None and registry['versions'][version]['meta']['signature'] != signature:
+            return None
+        return version
+
+
+def get_dataset(handle: DatasetHandle) -> Optional[Dict]:
+    """
+    Shared entry ({'data', 'index', 'cube', 'orders', 'orders_index', 'pairs', 'aggregates', 'models', 'meta'})
+    behind a handle - never mutate the frames
+    """
+    registry = _dataset_registry()
+    with registry['lock']:
+        return registry['versions'].get(handle.version)
+
+
+def _live_signatures(registry: Dict, source: str) -> set:
+    """
+    Signatures of the registered versions of a source folder (call with the registry lock held)
+    """
+    return {entry['meta']['signature'] for entry in registry['versions'].values() if entry['meta']['source'] == source}
+
+
+def invalidate_dataset(source: str) -> None:
+    """
+    Retire the current version of a source folder; sessions move to the next published version
+    Its persisted anomaly model goes with it unless a session still holds the version
+    """
+    registry = _dataset_registry()
+    with registry['lock']:
+        version = registry['current'].pop(source, None)
+        entry = registry['versions'].get(version)
+        if entry is not None and entry['refs'] <= 0:
+            del registry['versions'][version]
+        live = _live_signatures(registry, source)
+    prune_anomaly_models(source, live)
+
+# =============================================================================
+# FILTER INDEX
+# =============================================================================
+
+def build_filter_index(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Sort the dataset by day and index it for the global filters:
+    row range of each month, one boolean bitmap per brand and the sorted day keys for date slicing
+    Returns: (sorted DataFrame, index)
+    """
+    day_keys = df['DayKey'].to_numpy()
+    if len(day_keys) and (np.diff(day_keys) < 0).any():
+        df = df.sort_values('DayKey', kind='stable').reset_index(drop=True)
+        day_keys = df['DayKey'].to_numpy()
+
+    # Months are contiguous once sorted by day
+    months = df['Mois'].astype(str).to_numpy() if len(df) else np.array([], dtype=object)
+    starts = np.flatnonzero(np.r_[True, months[1:] != months[:-1]]) if len(months) else np.array([], dtype=np.int64)
+    stops = np.r_[starts[1:], len(months)]
+
+    return df, {
+        'day_keys': day_keys,
+        'months': {months[a]: (int(a), int(b)) for a, b in zip(starts, stops)},
+        'brands': {b: (df['Marque'] == b).to_numpy() for b in df['Marque'].unique()} if 'Marque' in df.columns else {},
+        'date_min': df['Date'].min() if len(df) else None,
+        'date_max': df['Date'].max() if len(df) else None
+    }
+
+
+def _day_key(value) -> int:
+    return int(np.datetime64(pd.Timestamp(value).date(), 'D').astype('int64'))
+
+
+def filter_rows(
+    df: pd.DataFrame,
+    index: Dict,
+    months: Optional[List[str]] = None,
+    brands: Optional[List[str]] = None,
+    date_range: Optional[Tuple] = None
+) -> pd.DataFrame:
+    """
+    Rows matching the global filters (empty months/brands = no filter, date range inclusive)
+    Month and date filters are binary searches over row ranges: a contiguous selection without brand
+    filter comes back as a slice of the shared frame (df itself when nothing is filtered out)
+    """
+    ranges = sorted(index['months'][m] for m in months if m in index['months']) if months else [(0, len(df))]
+
+    if date_range:
+        lo = int(np.searchsorted(index['day_keys'], _day_key(date_range[0]), side='left'))
+        hi = int(np.searchsorted(index['day_keys'], _day_key(date_range[1]), side='right'))
+        ranges = [(max(a, lo), min(b, hi)) for a, b in ranges]
+
+    # Merge adjacent ranges, drop empty ones
+    merged = []
+    for a, b in ranges:
+        if a >= b:
+            continue
+        if merged and merged[-1][1] == a:
+            merged[-1] = (merged[-1][0], b)
+        else:
+            merged.append((a, b))
+
+    bitmap = None
+    if brands and set(index['brands']) - set(brands):
+        bitmap = np.zeros(len(df), dtype=bool)
+        for brand in brands:
+            if brand in index['brands']:
+                bitmap |= index['brands'][brand]
+
+    if bitmap is None and merged == [(0, len(df))]:
+        return df
+    if bitmap is None and len(merged) == 1:
+        return df.iloc[merged[0][0]:merged[0][1]]
+
+    rows = np.concatenate([np.arange(a, b) for a, b in merged]) if merged else np.array([], dtype=np.int64)
+    if bitmap is not None:
+        rows = rows[bitmap[rows]]
+    return df.iloc[rows]
+
+# =============================================================================
+# OLAP CUBE
+# =============================================================================
+
+def _package_multiple(units: np.ndarray, size: Optional[pd.Series]) -> np.ndarray:
+    """
+    Lines whose units are a whole number (>= 1) of packages of the given size (missing = no package)
+    """
+    if size is None:
+        return np.zeros(len(units), dtype=bool)
+    size = size.to_numpy(dtype=float)
+    return (size > 0) & (units >= size) & (np.fmod(units, np.where(size > 0, size, 1)) == 0)
+
+
+def picking_modes(df: pd.DataFrame, bulk_units: int = PICKING_BULK_UNITS) -> pd.Categorical:
+    """
+    Picking mode of every line as a categorical over PICKING_MODES: whole PCB packages, whole SPCB
+    sub-packages, bulk above bulk_units units, else detail picking
+    """
+    units = df['Nbre Unités'].to_numpy(dtype=float)
+    codes = np.select(
+        [
+            _package_multiple(units, df['PCB'] if 'PCB' in df.columns else None),
+            _package_multiple(units, df['SPCB'] if 'SPCB' in df.columns else None),
+            units > bulk_units
+        ],
+        [0, 1, 2],
+        default=3
+    )
+    modes = PICKING_MODES[:2] + [f'Bulk (>{bulk_units} unités)', PICKING_MODES[3]]
+    return pd.Categorical.from_codes(codes.astype(np.int8), categories=modes)
+
+
+def build_cube(df: pd.DataFrame) -> Dict:
+    """
+    Measures pre-aggregated at CUBE_DIMENSIONS grain (units, prepared quantity, packages, line count),
+    plus the distinct (order, day, brand, country) memberships that keep order counts exact under filters
+    Both tables carry the calendar columns and their own filter index (see filter_rows)
+    """
+    return index_cube(*cube_tables(df))
+
+
+def cube_tables(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Cube cells and memberships of some lines, before calendar and index (mergeable, see merge_cube_tables)
+    """
+    dims = [c for c in CUBE_DIMENSIONS if c in df.columns]
+    measures = [c for c in ['Nbre Unités', 'Quantité préparée', 'Nbre Colis'] if c in df.columns]
+    grouped = df.groupby(dims, observed=True, sort=False, dropna=False)
+    cells = grouped[measures].sum()
+    cells['Lignes'] = grouped.size().astype('int32')
+
+    member_dims = ['No Op'] + [c for c in ['DayKey', 'Marque', 'Pays'] if c in df.columns]
+    members = df[member_dims].drop_duplicates() if 'No Op' in df.columns else pd.DataFrame(columns=member_dims)
+    return cells.reset_index(), members.reset_index(drop=True)
+
+
+def merge_cube_tables(tables: List[Tuple[pd.DataFrame, pd.DataFrame]]) -> Tuple[pd.DataFrame, pd.DataFrame]:
+    """
+    Cube cells and memberships of several line sets (see cube_tables)
+    """
+    cells = _concat_parts([c for c, _ in tables])
+    dims = [c for c in CUBE_DIMENSIONS if c in cells.columns]
+    cells = cells.groupby(dims, observed=True, sort=False, dropna=False).sum().reset_index()
+    members = _concat_parts([m for _, m in tables]).drop_duplicates().reset_index(drop=True)
+    return cells, members
+
+
+def index_cube(cells: pd.DataFrame, members: pd.DataFrame) -> Dict:
+    """
+    Calendar columns and filter index of cube tables (see build_cube)
+    """
+    cells, cells_index = build_filter_index(_with_calendar(cells))
+    members, members_index = build_filter_index(_with_calendar(members))
+    return {'cells': cells, 'cells_index': cells_index, 'members': members, 'members_index': members_index}
+
+
+def _with_calendar(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    Date and calendar columns of a frame keyed by DayKey
+    """
+    df['Date'] = df['DayKey'].to_numpy().astype('datetime64[D]').astype('datetime64[ns]')
+    return _add_calendar(df)
+
+# =============================================================================
+# ORDER FACTS
+# =============================================================================
+
+def build_order_facts(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Order fact table (see build_order_table) at order x brand x day grain, so that brand and date
+    filters cut orders exactly like they cut their lines (orders mixing brands or shipped over several
+    days); sorted and indexed like the lines (see filter_rows)
+    Returns: (DataFrame, filter index)
+    """
+    if 'No Op' not in df.columns:
+        return pd.DataFrame(), {}
+
+    facts = build_order_table(df, keys=FACT_KEYS)
+    return build_filter_index(_with_calendar(facts))
+
+
+def orders_by_id(orders: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per No Op: sums the brand and day rows of an order fact table (no-op for build_order_table output)
+    """
+    if not orders['No Op'].duplicated().any():
+        return orders
+
+    measures = [c for c in ['Lignes', 'Nbre Unités', 'Nbre Colis', 'Quantité préparée'] if c in orders.columns]
+    return orders.groupby('No Op', observed=True, sort=False)[measures].sum().reset_index()
+
+# =============================================================================
+# ANOMALY MODELS
+# =============================================================================
+
+def anomaly_features(orders: pd.DataFrame) -> pd.DataFrame:
+    """
+    One row per order with the anomaly features (ANOMALY_FEATURES), sorted by No Op
+    """
+    features = orders_by_id(orders)[['No Op', 'Nbre Unités', 'Lignes', 'Nbre Colis']].sort_values('No Op')
+    features.columns = ['No Op'] + ANOMALY_FEATURES
+    return features.reset_index(drop=True)
+
+
+def fit_anomaly_model(features: pd.DataFrame) -> IsolationForest:
+    """
+    IsolationForest on at most ANOMALY_MAX_SAMPLES orders, trees built on all cores
+    """
+    if len(features) > ANOMALY_MAX_SAMPLES:
+        features = features.sample(n=ANOMALY_MAX_SAMPLES, random_state=42)
+    return IsolationForest(
+        contamination=ANOMALY_CONTAMINATION,
+        random_state=42,
+        n_estimators=100,
+        n_jobs=-1
+    ).fit(features[ANOMALY_FEATURES].to_numpy())
+
+
+def anomaly_model(dataset: Dict) -> Optional[IsolationForest]:
+    """
+    Anomaly model of a dataset version, fitted once on all its orders and reused by every filter and session
+    Persisted with joblib next to the data cache (<cache>/models/anomaly-<signature>.joblib) so that
+    a restart or another replica reloads it instead of retraining
+    """
+    with dataset['models_lock']:
+        if 'anomaly' in dataset['models']:
+            return dataset['models']['anomaly']
+
+        model = None
+        orders = dataset['orders']
+        if 'No Op' in orders.columns:
+            path = _anomaly_model_path(dataset['meta']['source'], dataset['meta']['signature'])
+            try:
+                model = joblib.load(path) if path.exists() else None
+            except Exception:
+                model = None
+
+            features = anomaly_features(orders) if model is None else None
+            if model is None and len(features) >= 10:
+                model = fit_anomaly_model(features)
+                try:
+                    path.parent.mkdir(parents=True, exist_ok=True)
+                    joblib.dump(model, path)
+                except OSError:
+                    pass  # Read-only cache: the model stays in memory for this version
+
+        dataset['models']['anomaly'] = model
+        return model
+
+
+def _anomaly_model_path(source: str, signature: str) -> Path:
+    return _cache_dir(source) / 'models' / f"anomaly-{signature}.joblib"
+
+
+def prune_anomaly_models(source: str, keep: set) -> None:
+    """
+    Delete the persisted anomaly models of a source folder whose dataset signature is not in keep
+    (superseded versions); the online scoring baseline is left alone
+    """
+    baseline_path, _ = _baseline_paths(source)
+    for path in (_cache_dir(source) / 'models').glob('anomaly-*.joblib'):
+        if path != baseline_path and path.stem[len('anomaly-'):] not in keep:
+            path.unlink(missing_ok=True)
+
+
+def _baseline_paths(source: str) -> Tuple[Path, Path]:
+    """
+    Baseline model + running statistics, and alert table of the online scoring of a source folder
+    """
+    models_dir = _cache_dir(source) / 'models'
+    return models_dir / 'anomaly-baseline.joblib', models_dir / 'anomaly-alerts.feather'
+
+
+def _merge_stats(stats: Optional[Dict], values: np.ndarray, remove: bool = False) -> Dict:
+    """
+    Running count / mean / sum of squared deviations of the features, updated with a batch of rows,
+    or with a batch taken back out when remove is set (parallel form of Welford's algorithm)
+    """
+    count = len(values)
+    if count == 0:
+        return stats
+    mean = values.mean(axis=0)
+    m2 = ((values - mean) ** 2).sum(axis=0)
+
+    if remove:
+        total = (stats['count'] if stats else 0) - count
+        if total <= 0:
+            return {'count': 0, 'mean': np.zeros_like(mean), 'm2': np.zeros_like(m2)}
+        rest = (stats['mean'] * stats['count'] - mean * count) / total
+        delta = mean - rest
+        return {'count': total, 'mean': rest, 'm2': stats['m2'] - m2 - delta ** 2 * total * count / stats['count']}
+
+    if not stats or stats['count'] == 0:
+        return {'count': count, 'mean': mean, 'm2': m2}
+
+    total = stats['count'] + count
+    delta = mean - stats['mean']
+    return {
+        'count': total,
+        'mean': stats['mean'] + delta * count / total,
+        'm2': stats['m2'] + m2 + delta ** 2 * stats['count'] * count / total
+    }
+
+
+def score_new_orders(source: str, aggregates: Dict) -> Tuple[int, int]:
+    """
+    Online anomaly scoring of the orders that newly landed source files brought to a source folder
+    aggregates come from load_dataset or stream_aggregates: whole orders, never a sample. The first
+    call fits the baseline model on all orders, starts the running statistics and records every source
+    file of the folder (name -> hash). Files that appear or change later are 'landed': their orders are
+    scored against that baseline (no refit) whenever they are new to it or changed, possibly on a later
+    refresh if the month selection excludes them now; scoring updates the statistics and appends the
+    flagged orders to the alert table (see read_alerts). Orders of the files already there at the fit
+    that are new to the baseline (a wider month selection) join the statistics without alerts.
+    Returns: (orders scored, new alerts)
+    """
+    orders = aggregates['orders']
+    if 'No Op' not in orders.columns:
+        return 0, 0
+
+    baseline_path, alerts_path = _baseline_paths(source)
+    with _dataset_registry()['scoring_lock']:
+        try:
+            baseline = joblib.load(baseline_path) if baseline_path.exists() else None
+        except Exception:
+            baseline = None
+        if baseline is not None and 'landed' not in baseline:
+            baseline = None  # Saved before source files were tracked: refit
+
+        features = anomaly_features(orders)
+        current = pd.DataFrame(
+            features[ANOMALY_FEATURES].to_numpy(dtype=float),
+            index=pd.Index(features['No Op'].astype(str), name='No Op'),
+            columns=ANOMALY_FEATURES
+        )
+
+        if baseline is None:
+            if len(features) < 10:
+                return 0, 0
+            baseline = {
+                'model': fit_anomaly_model(features),
+                'stats': _merge_stats(None, current.to_numpy()),
+                'features': current,
+                'files': dict(aggregates['files']),
+                'landed': {}
+            }
+            alerts, scored = pd.DataFrame(), 0
+        else:
+            files, landed_files = baseline['files'], baseline['landed']
+            arrived = {name: digest for name, digest in aggregates['files'].items() if files.get(name) != digest}
+            landed_files = {
+                name: digest for name, digest in {**landed_files, **arrived}.items()
+                if aggregates['files'].get(name) == digest
+            }
+            sources = aggregates['sources']
+            landed = current.index.isin(sources.loc[sources['_Source'].isin(list(landed_files)), 'No Op'].to_numpy())
+
+            known = baseline['features'].reindex(current.index)
+            missing = known.isna().all(axis=1).to_numpy()
+            changed = landed & (known != current).any(axis=1).to_numpy()
+            backfill = missing & ~landed
+            scored = int(changed.sum())
+            if not scored and not backfill.any() and not arrived:
+                return 0, 0
+
+            values = current.to_numpy()[changed]
+            stats = baseline['stats']
+            alerts = pd.DataFrame()
+            if scored:
+                std = np.sqrt(stats['m2'] / max(stats['count'] - 1, 1))
+                flagged = baseline['model'].predict(values) == -1
+
+                alerts = features[changed][flagged].copy()
+                alerts['Score'] = alerts['Volume'] / stats['mean'][0] + alerts['Lignes'] / stats['mean'][1]
+                alerts['Écart max (σ)'] = (np.abs(values[flagged] - stats['mean']) / np.where(std > 0, std, 1)).max(axis=1).round(1)
+                alerts['Date'] = alerts['No Op'].map(orders.groupby('No Op', observed=True)['Date'].min())
+                alerts['Détectée le'] = pd.Timestamp.now().floor('s')
+                alerts['No Op'] = np.asarray(alerts['No Op'])
+
+            # Updated orders leave the statistics with their previous values, then all come back in
+            previous = known[changed].dropna().to_numpy()
+            stats = _merge_stats(stats, previous, remove=True)
+            baseline['stats'] = _merge_stats(stats, current.to_numpy()[changed | backfill])
+            updated = current[changed | backfill]
+            baseline['features'] = pd.concat([baseline['features'].drop(updated.index, errors='ignore'), updated])
+            baseline['files'] = {**files, **aggregates['files']}
+            baseline['landed'] = landed_files
+
+        try:
+            baseline_path.parent.mkdir(parents=True, exist_ok=True)
+            if not alerts.empty:
+                previous_alerts = _read_feather(alerts_path) if alerts_path.exists() else pd.DataFrame()
+                _write_feather(pd.concat([previous_alerts, alerts], ignore_index=True).tail(ANOMALY_ALERTS_MAX), alerts_path)
+            joblib.dump(baseline, baseline_path)
+        except OSError as e:
+            st.warning(f"⚠️ Could not save the anomaly baseline: {str(e)}")
+
+        return scored, len(alerts)
+
+
+def read_alerts(source: str) -> pd.DataFrame:
+    """
+    Alert table of the online scoring (newest first), empty before the first alert
+    """
+    _, alerts_path = _baseline_paths(source)
+    if not alerts_path.exists():
+        return pd.DataFrame()
+    return _read_feather(alerts_path).sort_values('Détectée le', ascending=False, kind='stable')
+
+
+def reset_anomaly_baseline(source: str) -> None:
+    """
+    Drop the baseline of a source folder: the next refresh fits a new one (alerts are kept)
+    """
+    baseline_path, _ = _baseline_paths(source)
+    with _dataset_registry()['scoring_lock']:
+        baseline_path.unlink(missing_ok=True)
+
+# =============================================================================
+# SLOTTING
+# =============================================================================
+
+def build_grid(aisles: int, slots: int, aisle_spacing: float, slot_width: float) -> Dict:
+    """
+    Picking locations of a parallel-aisle layout, numbered aisle by aisle from the depot
+    The depot is at the front of the first aisle; aisles are joined by a front and a back cross-aisle
+    """
+    location = np.arange(aisles * slots)
+    x = (location // slots) * aisle_spacing
+    y = (location % slots + 0.5) * slot_width
+    return {'x': x, 'y': y, 'depth': slots * slot_width, 'aisles': aisles, 'slots': slots, 'depot': x + y}
+
+
+def grid_distance(grid: Dict, a: np.ndarray, b: np.ndarray) -> np.ndarray:
+    """
+    Walking distance between locations: along the aisle when they share one, else through the
+    nearer cross-aisle (front or back)
+    """
+    x, y, depth = grid['x'], grid['y'], grid['depth']
+    across = np.abs(x[a] - x[b]) + np.minimum(y[a] + y[b], 2 * depth - y[a] - y[b])
+    return np.where(x[a] == x[b], np.abs(y[a] - y[b]), across)
+
+
+def _affinity_shift(affinity: sparse.csr_matrix, position: np.ndarray, grid: Dict, items: np.ndarray, target: np.ndarray) -> np.ndarray:
+    """
+    Change of co-picks x distance to its partners when each item moves from its location to target
+    """
+    lengths = np.diff(affinity.indptr)[items]
+    owner = np.repeat(np.arange(len(items)), lengths)
+    entries = np.arange(lengths.sum()) + np.repeat(affinity.indptr[items] - np.r_[0, np.cumsum(lengths)[:-1]], lengths)
+    partners = position[affinity.indices[entries]]
+    shift = grid_distance(grid, target[owner], partners) - grid_distance(grid, position[items][owner], partners)
+    return np.bincount(owner, weights=affinity.data[entries] * shift, minlength=len(items))
+
+
+def slotting_cost(picks: np.ndarray, affinity: sparse.csr_matrix, position: np.ndarray, grid: Dict, weight: float) -> Tuple[float, float]:
+    """
+    Expected travel of an assignment: (depot round trips of every pick, co-picked pairs x their distance)
+    """
+    pairs = sparse.triu(affinity, k=1).tocoo()
+    trips = float((picks * 2 * grid['depot'][position]).sum())
+    together = float((pairs.data * grid_distance(grid, position[pairs.row], position[pairs.col])).sum())
+    return trips, weight * together
+
+
+def optimize_slotting(picks: np.ndarray, affinity: sparse.csr_matrix, grid: Dict, weight: float = 1.0) -> Dict:
+    """
+    SKU to location assignment minimizing expected travel (see slotting_cost)
+    Greedy: the most picked SKUs take the locations closest to the depot. Local search: rounds of
+    improving swaps, evaluated in one vectorized batch per round, towards the location next to each
+    SKU's strongest partner and between neighbours in depot distance; non-conflicting swaps are applied
+    until a round brings no gain or the time budget runs out. After the first round only swaps touching a SKU that moved, or one of
+    its partners, are evaluated again. Locations left over hold zero-pick placeholders
+    Returns: {'position': location of each SKU, 'baseline': position by article order, costs of both}
+    """
+    n, size = len(picks), len(grid['depot'])
+    picks = np.r_[picks.astype(float), np.zeros(size - n)]
+    affinity = sparse.csr_matrix(affinity, dtype=float, copy=True)
+    affinity.resize((size, size))
+
+    baseline = np.arange(size)
+    by_depot = np.argsort(grid['depot'], kind='stable')
+    position = np.empty(size, dtype=np.int64)
+    position[np.argsort(-picks, kind='stable')] = by_depot
+    rank = np.empty(size, dtype=np.int64)
+    rank[by_depot] = np.arange(size)
+
+    # Strongest partner of each SKU
+    partner = np.where(np.diff(affinity.indptr) > 0, np.asarray(affinity.argmax(axis=1)).ravel(), -1)
+
+    def total(pos):
+        return sum(slotting_cost(picks, affinity, pos, grid, weight))
+
+    cost = total(position)
+    slots = grid['slots']
+    dirty = np.ones(size, dtype=bool)
+    deadline = time.time() + SLOTTING_SECONDS
+    for _ in range(SLOTTING_ROUNDS):
+        if time.time() > deadline:
+            break
+        occupant = np.empty(size, dtype=np.int64)
+        occupant[position] = np.arange(size)
+
+        # Candidate swaps: next to the strongest partner, and with neighbours in depot distance
+        movers = np.flatnonzero(partner >= 0)
+        near = np.concatenate([np.clip(position[partner[movers]] + step, 0, size - 1) for step in (-1, 1, -slots, slots)])
+        bands = np.concatenate([np.clip(rank[position] + step, 0, size - 1) for step in (-2, -1, 1, 2)])
+        a = np.r_[np.tile(movers, 4), np.tile(np.arange(size), 4)]
+        b = np.r_[occupant[near], occupant[by_depot[bands]]]
+        keep = (a != b) & (dirty[a] | dirty[b])
+        a, b = a[keep], b[keep]
+
+        la, lb = position[a], position[b]
+        gain = (picks[a] - picks[b]) * 2 * (grid['depot'][lb] - grid['depot'][la])
+        if weight:
+            ab = np.asarray(affinity[a, b]).ravel()
+            gain = gain + weight * (
+                _affinity_shift(affinity, position, grid, a, lb) + _affinity_shift(affinity, position, grid, b, la) +
+                2 * ab * grid_distance(grid, la, lb)
+            )
+
+        improving = np.flatnonzero(gain < -1e-9)
+        if len(improving) == 0:
+            break
+
+        # Best swaps first, each SKU moved at most once per round
+        used = np.zeros(size, dtype=bool)
+        trial = position.copy()
+        for i in improving[np.argsort(gain[improving], kind='stable')]:
+            if not (used[a[i]] or used[b[i]]):
+                used[a[i]] = used[b[i]] = True
+                trial[a[i]], trial[b[i]] = position[b[i]], position[a[i]]
+
+        # Swaps sharing partners interact: fall back to the single best one, whose gain is exact;
+        # the SKUs of the improving swaps left out are evaluated again next round
+        retry = np.zeros(size, dtype=bool)
+        new_cost = total(trial)
+        if new_cost >= cost:
+            i = improving[gain[improving].argmin()]
+            trial = position.copy()
+            trial[a[i]], trial[b[i]] = position[b[i]], position[a[i]]
+            new_cost = total(trial)
+            retry[a[improving]] = retry[b[improving]] = True
+
+        moved = (trial != position).astype(float)
+        dirty = retry | (moved > 0) | (affinity @ moved > 0)
+        position, cost = trial, new_cost
+
+    return {
+        'position': position[:n],
+        'baseline': baseline[:n],
+        'cost': slotting_cost(picks, affinity, position, grid, weight),
+        'baseline_cost': slotting_cost(picks, affinity, baseline, grid, weight)
+    }
+
+
+@st.cache_data(show_spinner=False, hash_funcs=FRAME_HASH_FUNCS)
+def compute_slotting(
+    clusters: pd.DataFrame,
+    affinities: Optional[pd.DataFrame],
+    aisles: int,
+    slots: int,
+    aisle_spacing: float,
+    slot_width: float,
+    weight: float
+) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Slotting of the articles of compute_clustering (picks = lines) with the pair affinities of the
+    associations (co-picks = Fréquence) on an aisles x slots grid
+    The most picked articles are slotted when the grid is smaller than the catalogue
+    Returns: (assignment, {'baseline', 'optimized': (trips, pairs) travel, 'slotted', 'skipped'})
+    """
+    try:
+        size = aisles * slots
+        articles = clusters.sort_values('Article', kind='stable')
+        if len(articles) > size:
+            articles = articles.nlargest(size, 'Lignes').sort_values('Article', kind='stable')
+        articles = articles.reset_index(drop=True)
+
+        n = len(articles)
+        affinity = sparse.csr_matrix((n, n))
+        if affinities is not None and not affinities.empty:
+            labels = pd.Index(articles['Article'].astype(str))
+            a = labels.get_indexer(affinities['Produit A'].astype(str))
+            b = labels.get_indexer(affinities['Produit B'].astype(str))
+            known = (a >= 0) & (b >= 0)
+            w = affinities['Fréquence'].to_numpy(dtype=float)[known]
+            affinity = sparse.csr_matrix((np.r_[w, w], (np.r_[a[known], b[known]], np.r_[b[known], a[known]])), shape=(n, n))
+
+        grid = build_grid(aisles, slots, aisle_spacing, slot_width)
+        result = optimize_slotting(articles['Lignes'].to_numpy(), affinity, grid, weight)
+
+        location = result['position']
+        articles['Allée'] = location // slots + 1
+        articles['Position'] = location % slots + 1
+        articles['Distance Dépôt (m)'] = grid['depot'][location].round(1)
+        articles['Allée Référence'] = result['baseline'] // slots + 1
+        columns = ['Article', 'Allée', 'Position', 'Distance Dépôt (m)', 'Allée Référence', 'Lignes', 'Cluster_Label']
+        assignment = articles[[c for c in columns if c in articles.columns]].sort_values(['Allée', 'Position'])
+
+        return assignment.reset_index(drop=True), {
+            'baseline': result['baseline_cost'],
+            'optimized': result['cost'],
+            'slotted': n,
+            'skipped': len(clusters) - n
+        }
+
+    except Exception as e:
+        st.error(f"Error in slotting: {str(e)}")
+        return pd.DataFrame(), {}
+
+# =============================================================================
+# CO-OCCURRENCE PARTIALS
+# =============================================================================
+
+def build_pair_partials(df: pd.DataFrame, index: Dict) -> Optional[Dict]:
+    """
+    Pair counts, per-article basket counts and basket count of every (Mois, Marque) partition, all in
+    one article space so that a month / brand selection is a sum of sparse matrices (see combine_pair_partials)
+    Lines of orders split across partitions are kept aside, indexed like the lines, for the exact correction;
+    months cut by a date range are read back from the shared lines (df with its filter index), not copied.
+    The recommender's neighbour index of the unfiltered selection is built once here (see compute_neighbours)
+    """
+    if 'No Op' not in df.columns:
+        return None
+
+    lines = df.loc[df['Nbre Unités'] > 0, ['No Op', 'Article', 'Mois', 'Marque', 'DayKey', 'Date']]
+    articles = lines['Article'].astype('category')
+    labels = articles.cat.categories.sort_values()
+    lines['Article'] = pd.Categorical(articles, categories=labels)
+    cells, spanning = _pair_partition_tables(lines)
+
+    day_keys = index['day_keys']
+    return _finish_pair_partials({
+        'labels': labels,
+        'months': {month: (int(day_keys[a]), int(day_keys[b - 1])) for month, (a, b) in index['months'].items()},
+        'read_lines': functools.partial(_partition_lines, df, index, labels),
+        'cells': cells,
+        'spanning': spanning
+    })
+
+
+def _pair_partition_tables(lines: pd.DataFrame) -> Tuple[Dict, pd.DataFrame]:
+    """
+    Partition counts of (No Op, Article, Mois, Marque, ...) lines holding complete orders, and the lines
+    of the orders found in more than one partition
+    """
+    grouped = lines.groupby(['Mois', 'Marque'], observed=True, sort=False)
+    cells = {
+        (str(month), brand): _partition_counts(lines.iloc[rows], ['No Op'])
+        for (month, brand), rows in grouped.indices.items()
+    }
+
+    memberships = pd.DataFrame({'order': pd.factorize(lines['No Op'])[0], 'partition': grouped.ngroup().to_numpy()})
+    per_order = memberships.drop_duplicates().groupby('order').size()
+    split = np.isin(memberships['order'].to_numpy(), per_order.index[per_order > 1])
+    return cells, lines[split]
+
+
+def _finish_pair_partials(partials: Dict) -> Dict:
+    """
+    Index the spanning lines and build the neighbour index of assembled pair partials
+    """
+    partials['spanning'], partials['spanning_index'] = build_filter_index(partials['spanning'].reset_index(drop=True))
+    pairs, items, baskets = combine_pair_partials(partials)
+    partials['neighbours'] = pair_neighbours(pairs, partials['labels'], items, baskets)
+    return partials
+
+
+def _partition_lines(
+    df: pd.DataFrame,
+    index: Dict,
+    labels: pd.Index,
+    months: List[str],
+    brands: List[str],
+    date_range: Optional[Tuple]
+) -> pd.DataFrame:
+    """
+    (No Op, Article, Mois, Marque) lines with units matching the filters, articles in the partials' space
+    """
+    lines = filter_rows(df, index, months, brands, date_range)
+    lines = lines.loc[lines['Nbre Unités'] > 0, ['No Op', 'Article', 'Mois', 'Marque']]
+    return lines.assign(Article=pd.Categorical(lines['Article'].astype(str), categories=labels))
+
+
+def _partition_counts(lines: pd.DataFrame, keys: List[str]) -> Dict:
+    """
+    Upper-triangular pair counts, per-article basket counts and basket count of (keys, Article) lines
+    """
+    incidence, _ = basket_incidence(lines, keys)
+    return {'pairs': cooccurrence(incidence).tocsr(), 'items': _item_counts(incidence), 'baskets': incidence.shape[0]}
+
+
+def _sum_partition_counts(parts: List[Dict], size: int) -> Dict:
+    """
+    Partition counts (see _partition_counts) of disjoint sets of baskets added up
+    """
+    pairs = sparse.csr_matrix((size, size), dtype=np.int64)
+    items = np.zeros(size, dtype=np.int64)
+    baskets = 0
+    for part in parts:
+        pairs = pairs + part['pairs']
+        items += part['items']
+        baskets += part['baskets']
+    return {'pairs': pairs, 'items': items, 'baskets': baskets}
+
+
+def _stream_lines(
+    lines_dir: Path,
+    labels: pd.Index,
+    months: List[str],
+    brands: List[str],
+    date_range: Optional[Tuple]
+) -> pd.DataFrame:
+    """
+    (No Op, Article, Mois, Marque) lines matching the filters, read back from the per-month files of
+    the streaming cache (see stream_aggregates) - the stream counterpart of _partition_lines
+    """
+    frames = []
+    for month in months:
+        with pa.memory_map(str(lines_dir / f"{month}.arrow")) as source:
+            lines = pa.ipc.open_file(source).read_all().to_pandas()
+        keep = lines['Marque'].isin(brands).to_numpy()
+        if date_range:
+            keep &= lines['DayKey'].between(_day_key(date_range[0]), _day_key(date_range[1])).to_numpy()
+        frames.append(lines.loc[keep, ['No Op', 'Article', 'Mois', 'Marque']])
+
+    lines = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=['No Op', 'Article', 'Mois', 'Marque'])
+    return lines.assign(Article=pd.Categorical(lines['Article'], categories=labels))
+
+
+def combine_pair_partials(
+    partials: Dict,
+    months: Optional[List[str]] = None,
+    brands: Optional[List[str]] = None,
+    date_range: Optional[Tuple] = None
+) -> Tuple[sparse.coo_matrix, np.ndarray, int]:
+    """
+    Pair counts, per-article basket counts and basket count of the lines matching the global filters
+    Months fully inside the date range sum their stored partitions; months cut by the date range are
+    counted from their lines. Orders spanning several selected partitions are then counted once as a whole
+    (their split baskets are subtracted and the joined ones added, as in merge_partials)
+    """
+    months = [m for m in months if m in partials['months']] if months else list(partials['months'])
+    brands = brands or sorted({brand for _, brand in partials['cells']})
+    lo, hi = (_day_key(date_range[0]), _day_key(date_range[1])) if date_range else (-np.inf, np.inf)
+
+    full, cut = [], []
+    for month in months:
+        first, last = partials['months'][month]
+        if lo <= first and last <= hi:
+            full.append(month)
+        elif first <= hi and lo <= last:
+            cut.append(month)
+
+    parts = [partials['cells'][(m, b)] for m in full for b in brands if (m, b) in partials['cells']]
+    if cut:
+        parts.append(_partition_counts(partials['read_lines'](cut, brands, date_range), ['No Op', 'Mois', 'Marque']))
+
+    total = _sum_partition_counts(parts, len(partials['labels']))
+    pairs, items, baskets = total['pairs'], total['items'], total['baskets']
+
+    spanning = filter_rows(partials['spanning'], partials['spanning_index'], months, brands, date_range)
+    if len(spanning):
+        split = _partition_counts(spanning, ['No Op', 'Mois', 'Marque'])
+        joined = _partition_counts(spanning, ['No Op'])
+        pairs = pairs - split['pairs'] + joined['pairs']
+        items += joined['items'] - split['items']
+        baskets += joined['baskets'] - split['baskets']
+        pairs.eliminate_zeros()
+
+    return pairs.tocoo(), items, baskets
+
+
+def assoc_from_partials(partials: Dict, min_pct: float, k: int = ASSOC_TOP_K, **filters) -> Tuple[Optional[pd.DataFrame], int]:
+    """
+    Top k pairs of the filtered selection from the co-occurrence partials: the support threshold
+    only filters the combined counts (see top_pairs)
+    """
+    pairs, items, baskets = combine_pair_partials(partials, **filters)
+    return top_pairs(pairs, partials['labels'], baskets, min_pct, items, k)
+
+
+@st.cache_data(show_spinner=False)
+def compute_neighbours(key: str, _partials: Dict, **filters) -> Dict:
+    """
+    Neighbour index of the filtered selection over every counted pair (see pair_neighbours)
+    Cached per dataset version and filter signature (key); the partials themselves are not hashed
+    """
+    pairs, items, baskets = combine_pair_partials(_partials, **filters)
+    return pair_neighbours(pairs, _partials['labels'], items, baskets)
+
+# =============================================================================
+# EXPORT UTILITIES
+# =============================================================================
+
+def export_to_excel(dataframes: Dict[str, pd.DataFrame], filename: str) -> BytesIO:
+    """
+    Export multiple dataframes to Excel with formatting
+    """
+    output = BytesIO()
+
+    with pd.ExcelWriter(output, engine='openpyxl') as writer:
+        for sheet_name, df in dataframes.items():
+            df.to_excel(writer, sheet_name=sheet_name[:31], index=False)
+
+    output.seek(0)
+    return output
+
+def create_summary_report(df: pd.DataFrame, kpis: Dict) -> str:
+    """
+    Generate executive summary report
+    """
+    report = f"""
+# WMS Analytics - Executive Summary
+Generated: {datetime.now().strftime('%Y-%m-%d %H:%M')}
+
+## Key Performance Indicators
+
+### Volume Metrics
+- Total Units Processed: {kpis.get('total_units', 0):,.0f}
+- Total Orders: {kpis.get('total_orders', 0):,.0f}
+- Total Packages: {kpis.get('total_colis', 0):,.0f}
+
+### Operational Efficiency
+- Package Density: {kpis.get('density', 0):.2f} units/package
+- Average Lines per Order: {kpis.get('avg_lines', 0):.2f}
+- Single-Line Orders: {kpis.get('pct_mono', 0):.1f}%
+
+### Period Analyzed
+- Date Range: {df['Date'].min().strftime('%Y-%m-%d')} to {df['Date'].max().strftime('%Y-%m-%d')}
+- Total Days: {(df['Date'].max() - df['Date'].min()).days}
+
+---
+Report generated by WMS Analytics Pro v6.0
+"""
+    return report
@@ -0,0 +1,230 @@
+"""
+Vectorized demand forecasting for WMS Analytics Pro
+Every daily series (one per article, or article x brand) is a row of one matrix and each model
+fits all rows at once with NumPy: the loops run over days, never over SKUs
+"""
+
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+SEASON = 7  # Weekly seasonality of the daily series
+SES_ALPHAS = (0.1, 0.2, 0.3, 0.5, 0.8)  # Smoothing factors tried per series
+PROFILE_WEEKS = 8  # Weeks of history behind the weekday profile
+MA_WINDOW = 7  # Window of the moving-average baseline
+
+
+def build_series(cells: pd.DataFrame, metric: str, keys: List[str]) -> Tuple[pd.DataFrame, np.ndarray, int]:
+    """
+    Dense series x day matrix of a metric summed by keys and DayKey, days without activity at 0
+    Returns: (keys of each row, matrix, DayKey of the first column)
+    """
+    grouped = cells.groupby(keys + ['DayKey'], observed=True, sort=False)[metric].sum()
+    day_keys = grouped.index.get_level_values('DayKey').to_numpy()
+    series = grouped.index.droplevel('DayKey')
+    rows, labels = pd.factorize(series)
+
+    first = int(day_keys.min()) if len(day_keys) else 0
+    days = int(day_keys.max()) - first + 1 if len(day_keys) else 0
+    matrix = np.zeros((len(labels), days), dtype=np.float64)
+    np.add.at(matrix, (rows, day_keys - first), grouped.to_numpy(dtype=np.float64))
+
+    frame = labels.to_frame(index=False, name=keys) if isinstance(labels, pd.MultiIndex) else pd.DataFrame({keys[0]: labels})
+    return frame, matrix, first
+
+
+def _pad(history: np.ndarray, width: int) -> np.ndarray:
+    """
+    Left-pad series shorter than width days with zeros
+    """
+    missing = width - history.shape[1]
+    return np.pad(history, ((0, 0), (missing, 0))) if missing > 0 else history
+
+
+def moving_average(history: np.ndarray, window: int = MA_WINDOW) -> np.ndarray:
+    """
+    Flat level at the mean of the last window days
+    """
+    return _pad(history, window)[:, -window:].mean(axis=1, keepdims=True)
+
+
+def seasonal_naive(history: np.ndarray, season: int = SEASON) -> np.ndarray:
+    """
+    Last observed season
+    """
+    return _pad(history, season)[:, -season:]
+
+
+def ses(history: np.ndarray, alphas: Tuple[float, ...] = SES_ALPHAS) -> np.ndarray:
+    """
+    Simple exponential smoothing, flat at the final level
+    The smoothing factor of each series is the one with the lowest in-sample one-step squared error;
+    all factors and all series run through the same recursion over days
+    """
+    if history.shape[1] == 0:
+        return np.zeros((history.shape[0], 1))
+
+    alpha = np.asarray(alphas)[:, None]
+    level = np.repeat(history[None, :, 0], len(alphas), axis=0)
+    sse = np.zeros_like(level)
+    for t in range(1, history.shape[1]):
+        error = history[:, t] - level
+        sse += error ** 2
+        level += alpha * error
+
+    best = sse.argmin(axis=0)
+    return level[best, np.arange(history.shape[0])][:, None]
+
+
+def weekday_profile(history: np.ndarray, weeks: int = PROFILE_WEEKS) -> np.ndarray:
+    """
+    Mean of each weekday over the last weeks
+    """
+    recent = _pad(history, SEASON)
+    recent = recent[:, -(recent.shape[1] // SEASON) * SEASON:][:, -weeks * SEASON:]
+    return recent.reshape(len(recent), -1, SEASON).mean(axis=1)
+
+
+# Each model fits a pattern per series (one value, or one per weekday) repeated over the horizon
+MODELS = {
+    'moving_average': moving_average,
+    'seasonal_naive': seasonal_naive,
+    'ses': ses,
+    'weekday_profile': weekday_profile
+}
+
+
+def predict(pattern: np.ndarray, horizon: int) -> np.ndarray:
+    """
+    Pattern of each series repeated over horizon days, clipped at 0
+    The pattern's first column falls on the day after the history
+    """
+    return np.clip(pattern[:, np.arange(horizon) % pattern.shape[1]], 0, None)
+
+
+def forecast(history: np.ndarray, horizon: int, model: str) -> np.ndarray:
+    """
+    Forecast of every series (row) over horizon days with one of MODELS
+    """
+    return predict(MODELS[model](history), horizon)
+
+
+def forecast_table(
+    cells: pd.DataFrame,
+    metric: str,
+    keys: List[str],
+    model: str,
+    horizon: int
+) -> Tuple[pd.DataFrame, np.ndarray, Dict]:
+    """
+    Forecast of every series built from cells (see build_series)
+    Returns: (keys of each row, forecast matrix, {'history': matrix, 'first_day': DayKey of its first column})
+    """
+    frame, history, first = build_series(cells, metric, keys)
+    return frame, forecast(history, horizon, model), {'history': history, 'first_day': first}
+
+
+def month_origins(first_day: int, days: int, min_history: int, horizon: int) -> List[int]:
+    """
+    Rolling forecast origins at the first day of each month (one per monthly source file), as column
+    offsets of a series matrix starting at first_day, keeping those with min_history days before and
+    horizon days after
+    """
+    dates = pd.DatetimeIndex(np.arange(first_day, first_day + days).astype('datetime64[D]'))
+    starts = np.flatnonzero(dates.day == 1)
+    return [int(o) for o in starts if o >= min_history and o + horizon <= days]
+
+
+def backtest_origin(history: np.ndarray, model: str, origin: int, horizon: int) -> Dict:
+    """
+    Error sums and timings of one model forecasting horizon days from one origin
+    Sums rather than ratios, so that origins run apart can be added up (see summarize_backtest)
+    """
+    start = time.perf_counter()
+    pattern = MODELS[model](history[:, :origin])
+    fitted = time.perf_counter()
+    predicted = predict(pattern, horizon)
+    done = time.perf_counter()
+
+    actual = history[:, origin:origin + horizon]
+    error = predicted - actual
+    sold = actual > 0
+    return {
+        'model': model,
+        'abs_error': float(np.abs(error).sum()),
+        'error': float(error.sum()),
+        'actual': float(actual.sum()),
+        'ape': float((np.abs(error[sold]) / actual[sold]).sum()),
+        'ape_count': int(sold.sum()),
+        'fit_s': fitted - start,
+        'predict_s': done - fitted
+    }
+
+
+def run_backtest(
+    history: np.ndarray,
+    origins: List[int],
+    horizon: int,
+    models: Optional[List[str]] = None,
+    workers: int = 1
+) -> List[Dict]:
+    """
+    Every (model, origin) evaluation, spread over a process pool when workers > 1
+    Workers are spawned (not forked) so that the threads of the calling server are not duplicated
+    """
+    tasks = [(model, origin, horizon) for model in (models or list(MODELS)) for origin in origins]
+    if workers <= 1 or len(tasks) <= 1:
+        return [backtest_origin(history, *task) for task in tasks]
+
+    # The matrix is shipped once per worker, not once per task
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(
+        max_workers=min(workers, len(tasks)),
+        mp_context=context,
+        initializer=_init_worker,
+        initargs=(history,)
+    ) as pool:
+        return list(pool.map(_worker_backtest, *zip(*tasks)))
+
+
+_WORKER_HISTORY: Optional[np.ndarray] = None
+
+
+def _init_worker(history: np.ndarray) -> None:
+    global _WORKER_HISTORY
+    _WORKER_HISTORY = history
+
+
+def _worker_backtest(model: str, origin: int, horizon: int) -> Dict:
+    return backtest_origin(_WORKER_HISTORY, model, origin, horizon)
+
+
+def summarize_backtest(results: List[Dict]) -> pd.DataFrame:
+    """
+    Accuracy and timings per model over all origins
+    MAPE over the SKU-days with sales, WAPE and bias relative to the total actual volume
+    """
+    sums = pd.DataFrame(results).groupby('model', sort=False).agg(
+        abs_error=('abs_error', 'sum'),
+        error=('error', 'sum'),
+        actual=('actual', 'sum'),
+        ape=('ape', 'sum'),
+        ape_count=('ape_count', 'sum'),
+        origins=('model', 'size'),
+        fit_s=('fit_s', 'sum'),
+        predict_s=('predict_s', 'sum')
+    )
+    actual = sums['actual'].where(sums['actual'] > 0)
+    return pd.DataFrame({
+        'Modèle': sums.index,
+        'MAPE (%)': (sums['ape'] / sums['ape_count'].where(sums['ape_count'] > 0) * 100).round(1).to_numpy(),
+        'WAPE (%)': (sums['abs_error'] / actual * 100).round(1).to_numpy(),
+        'Biais (%)': (sums['error'] / actual * 100).round(1).to_numpy(),
+        'Origines': sums['origins'].to_numpy(),
+        'Fit (ms)': (sums['fit_s'] / sums['origins'] * 1000).round(2).to_numpy(),
+        'Prédiction (ms)': (sums['predict_s'] / sums['origins'] * 1000).round(3).to_numpy()
+    }).sort_values('WAPE (%)').reset_index(drop=True)
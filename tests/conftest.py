@@ -0,0 +1,55 @@
+"""
+Shared fixtures: a small cleaned dataset and naive counts to check the engine against
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+
+@pytest.fixture
+def lines():
+    """
+    Small cleaned dataset: one source file per month, 2 brands, some orders spanning two files,
+    repeated articles within an order and lines without units
+    """
+    rng = np.random.default_rng(7)
+    n = 600
+    order = rng.integers(0, 120, n)
+    dates = pd.Timestamp('2024-01-01') + pd.to_timedelta(order % 90 + rng.integers(0, 2, n) * 20, unit='D')
+    df = pd.DataFrame({
+        'No Op': pd.Categorical([f'OP{o:04d}' for o in order]),
+        'Article': pd.Categorical([f'A{a:02d}' for a in rng.integers(0, 15, n)]),
+        'Marque': pd.Categorical(np.where(order % 3 == 0, 'NIKE', 'ADIDAS')),
+        'Date': dates,
+        'Nbre Unités': rng.integers(0, 4, n).astype(float),
+        'Nbre Colis': rng.integers(0, 2, n).astype(float)
+    })
+    df['Mois'] = pd.Categorical(df['Date'].dt.strftime('%Y-%m'))
+    df['DayKey'] = df['Date'].values.astype('datetime64[D]').astype('int64')
+    df['_Source'] = pd.Categorical('wms_' + df['Mois'].astype(str) + '.parquet')
+    return df.sort_values('DayKey', kind='stable').reset_index(drop=True)
+
+
+def naive_pairs(df, keys=('No Op',)):
+    """
+    Pair counts, per-article basket counts and basket count by enumerating every basket with units
+    """
+    from collections import Counter
+    from itertools import combinations
+
+    pairs, items, baskets = Counter(), Counter(), 0
+    for _, basket in df[df['Nbre Unités'] > 0].groupby(list(keys), observed=True)['Article']:
+        articles = sorted(set(basket.astype(str)))
+        if len(articles) < 2:
+            continue
+        baskets += 1
+        items.update(articles)
+        pairs.update(combinations(articles, 2))
+    return dict(pairs), dict(items), baskets
@@ -0,0 +1,64 @@
+import numpy as np
+import pytest
+
+import engine
+
+
+@pytest.fixture
+def batches():
+    rng = np.random.default_rng(11)
+    return [rng.normal(loc=i, scale=1 + i, size=(size, 3)) for i, size in enumerate([40, 1, 25, 60])]
+
+
+def _expected(values):
+    mean = values.mean(axis=0)
+    return {'count': len(values), 'mean': mean, 'm2': ((values - mean) ** 2).sum(axis=0)}
+
+
+def _assert_stats(stats, expected):
+    assert stats['count'] == expected['count']
+    np.testing.assert_allclose(stats['mean'], expected['mean'])
+    np.testing.assert_allclose(stats['m2'], expected['m2'])
+
+
+def test_batches_merge_to_whole_statistics(batches):
+    stats = None
+    for batch in batches:
+        stats = engine._merge_stats(stats, batch)
+    _assert_stats(stats, _expected(np.vstack(batches)))
+
+
+def test_empty_batch_leaves_statistics(batches):
+    stats = engine._merge_stats(None, batches[0])
+    assert engine._merge_stats(stats, batches[0][:0]) is stats
+    assert engine._merge_stats(stats, batches[0][:0], remove=True) is stats
+
+
+@pytest.mark.parametrize('removed', [[0], [1], [2, 3], [0, 1, 2]])
+def test_removed_batches_leave_remaining_statistics(batches, removed):
+    stats = None
+    for batch in batches:
+        stats = engine._merge_stats(stats, batch)
+    for i in removed:
+        stats = engine._merge_stats(stats, batches[i], remove=True)
+
+    _assert_stats(stats, _expected(np.vstack([b for i, b in enumerate(batches) if i not in removed])))
+
+
+def test_removing_everything_resets_statistics(batches):
+    stats = engine._merge_stats(None, batches[0])
+    stats = engine._merge_stats(stats, batches[0], remove=True)
+    assert stats['count'] == 0
+    np.testing.assert_array_equal(stats['mean'], 0)
+    np.testing.assert_array_equal(stats['m2'], 0)
+
+    # Statistics restart from the next batch
+    _assert_stats(engine._merge_stats(stats, batches[2]), _expected(batches[2]))
+
+
+@pytest.mark.parametrize('empty', [None, {'count': 0, 'mean': np.zeros(3), 'm2': np.zeros(3)}])
+def test_removing_from_empty_statistics_keeps_them_empty(batches, empty):
+    stats = engine._merge_stats(empty, batches[0], remove=True)
+    assert stats['count'] == 0
+    np.testing.assert_array_equal(stats['mean'], 0)
+    np.testing.assert_array_equal(stats['m2'], 0)
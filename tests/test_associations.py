@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import engine
+
+from conftest import naive_pairs
+
+
+def _baskets(lines):
+    return lines.loc[lines['Nbre Unités'] > 0, ['No Op', 'Article']]
+
+
+def test_incidence_is_binary_over_multi_article_baskets(lines):
+    incidence, labels = engine.basket_incidence(_baskets(lines), ['No Op'])
+    _, items, baskets = naive_pairs(lines)
+
+    assert list(labels) == sorted(labels)
+    assert incidence.shape == (baskets, len(labels))
+    assert set(incidence.data) == {1}
+    assert (incidence.getnnz(axis=1) > 1).all()
+    assert dict(zip(labels, np.asarray(incidence.sum(axis=0)).ravel())) == {a: items.get(a, 0) for a in labels}
+
+
+def test_cooccurrence_matches_enumerated_pairs(lines):
+    incidence, labels = engine.basket_incidence(_baskets(lines), ['No Op'])
+    counts = engine.cooccurrence(incidence)
+    pairs, _, _ = naive_pairs(lines)
+
+    assert (counts.row < counts.col).all()
+    assert {(labels[r], labels[c]): v for r, c, v in zip(counts.row, counts.col, counts.data)} == pairs
+
+
+@pytest.mark.parametrize('min_pct, k', [(0.0, 500), (3.0, 500), (3.0, 5), (50.0, 10)])
+def test_top_pairs_matches_naive_ranking(lines, min_pct, k):
+    incidence, labels = engine.basket_incidence(_baskets(lines), ['No Op'])
+    top, n = engine.top_pairs(engine.cooccurrence(incidence), labels, incidence.shape[0], min_pct, engine._item_counts(incidence), k)
+    pairs, items, baskets = naive_pairs(lines)
+
+    expected = sorted(
+        ((a, b, f) for (a, b), f in pairs.items() if f >= max(2, baskets * min_pct / 100)),
+        key=lambda p: (-p[2], p[0], p[1])
+    )[:k]
+    assert n == baskets
+    if not expected:
+        assert top is None
+        return
+
+    assert list(top[['Produit A', 'Produit B', 'Fréquence']].itertuples(index=False, name=None)) == expected
+    freq = top['Fréquence'].to_numpy(dtype=float)
+    count_a = top['Produit A'].map(items).to_numpy(dtype=float)
+    count_b = top['Produit B'].map(items).to_numpy(dtype=float)
+    np.testing.assert_allclose(top['Support'], (freq / baskets * 100).round(2))
+    np.testing.assert_allclose(top['Confiance A→B'], (freq / count_a * 100).round(1))
+    np.testing.assert_allclose(top['Confiance B→A'], (freq / count_b * 100).round(1))
+    np.testing.assert_allclose(top['Lift'], (freq * baskets / (count_a * count_b)).round(2))
+
+
+def test_pair_counts_by_day_baskets(lines):
+    got, items, n = engine._pair_counts(lines, ['No Op', 'DayKey'])
+    pairs, expected_items, baskets = naive_pairs(lines, ('No Op', 'DayKey'))
+
+    assert dict(zip(zip(got['Produit A'], got['Produit B']), got['Fréquence'])) == pairs
+    assert dict(zip(items['Article'], items['Paniers'])) == expected_items
+    assert n == baskets
+
+
+@pytest.mark.parametrize('min_pct', [3.0, 4.0])
+def test_itemsets_mined_at_the_floor_filter_to_any_threshold(lines, min_pct):
+    incidence, labels = engine.basket_incidence(_baskets(lines), ['No Op'])
+    floor = engine.mine_itemsets(incidence, labels, engine.ASSOC_MIN_SUPPORT, k=20)
+    direct = engine.mine_itemsets(incidence, labels, min_pct, k=20)
+
+    n = incidence.shape[0]
+    filtered = floor[floor['Fréquence'] >= max(2, n * min_pct / 100)].reset_index(drop=True)
+    assert len(floor) > len(direct) > 0
+    pd.testing.assert_frame_equal(filtered, direct.reset_index(drop=True))
@@ -0,0 +1,53 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import engine
+
+CASES = [
+    {},
+    {'months': ['2024-02']},
+    {'months': ['2024-01', '2024-03']},
+    {'months': ['2024-04', '2024-01', '2024-02', '2024-03']},
+    {'months': ['2030-01']},
+    {'brands': ['NIKE']},
+    {'brands': ['NIKE', 'ADIDAS']},
+    {'months': ['2024-02', '2024-03'], 'brands': ['ADIDAS']},
+    {'date_range': (pd.Timestamp('2024-01-15'), pd.Timestamp('2024-02-10'))},
+    {'date_range': (pd.Timestamp('2024-02-10'), pd.Timestamp('2024-02-10'))},
+    {'months': ['2024-01', '2024-03'], 'date_range': (pd.Timestamp('2024-01-20'), pd.Timestamp('2024-03-05'))},
+    {'months': ['2024-02'], 'brands': ['NIKE'], 'date_range': (pd.Timestamp('2024-02-03'), pd.Timestamp('2024-05-01'))},
+]
+
+
+def _naive(df, months=None, brands=None, date_range=None):
+    mask = np.ones(len(df), dtype=bool)
+    if months:
+        mask &= df['Mois'].astype(str).isin(months).to_numpy()
+    if brands:
+        mask &= df['Marque'].isin(brands).to_numpy()
+    if date_range:
+        day = df['Date'].dt.normalize()
+        mask &= ((day >= date_range[0]) & (day <= date_range[1])).to_numpy()
+    return df[mask]
+
+
+@pytest.mark.parametrize('filters', CASES)
+def test_filter_rows_matches_boolean_masks(lines, filters):
+    df, index = engine.build_filter_index(lines.sample(frac=1, random_state=3).reset_index(drop=True))
+    got = engine.filter_rows(df, index, **filters)
+    pd.testing.assert_frame_equal(got, _naive(df, **filters))
+
+
+def test_unfiltered_selection_is_not_copied(lines):
+    df, index = engine.build_filter_index(lines)
+    assert engine.filter_rows(df, index) is df
+    assert engine.filter_rows(df, index, brands=['NIKE', 'ADIDAS']) is df
+
+
+def test_index_months_are_contiguous_row_ranges(lines):
+    df, index = engine.build_filter_index(lines.iloc[::-1].reset_index(drop=True))
+    assert (np.diff(index['day_keys']) >= 0).all()
+    for month, (a, b) in index['months'].items():
+        assert (df['Mois'].astype(str).iloc[a:b] == month).all()
+    assert sum(b - a for a, b in index['months'].values()) == len(df)
@@ -0,0 +1,104 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+import forecasting
+
+
+@pytest.fixture
+def cells(lines):
+    return lines.groupby(['Article', 'Marque', 'DayKey'], observed=True, as_index=False)['Nbre Unités'].sum()
+
+
+@pytest.fixture
+def history(cells):
+    return forecasting.build_series(cells, 'Nbre Unités', ['Article'])[1]
+
+
+def test_build_series_matches_pivot(cells):
+    frame, matrix, first = forecasting.build_series(cells, 'Nbre Unités', ['Article', 'Marque'])
+    days = range(cells['DayKey'].min(), cells['DayKey'].max() + 1)
+    pivot = cells.pivot_table(index=['Article', 'Marque'], columns='DayKey', values='Nbre Unités', aggfunc='sum', observed=True)
+    pivot = pivot.reindex(columns=days, fill_value=0).fillna(0)
+
+    assert first == cells['DayKey'].min()
+    expected = pivot.loc[list(frame.itertuples(index=False, name=None))].to_numpy()
+    np.testing.assert_array_equal(matrix, expected)
+
+
+def test_baselines_match_pandas(history):
+    frame = pd.DataFrame(history)
+    np.testing.assert_allclose(forecasting.moving_average(history)[:, 0], frame.T.rolling(7).mean().iloc[-1])
+    np.testing.assert_array_equal(forecasting.seasonal_naive(history), history[:, -7:])
+
+    weeks = history[:, -(history.shape[1] // 7) * 7:][:, -8 * 7:]
+    weekdays = pd.DataFrame(weeks.T).groupby(np.arange(weeks.shape[1]) % 7).mean().T
+    np.testing.assert_allclose(forecasting.weekday_profile(history), weekdays)
+
+
+def test_short_history_is_padded_with_zeros():
+    history = np.array([[4.0, 2.0]])
+    np.testing.assert_allclose(forecasting.moving_average(history), [[6.0 / 7]])
+    np.testing.assert_array_equal(forecasting.seasonal_naive(history), [[0, 0, 0, 0, 0, 4, 2]])
+
+
+def test_ses_matches_per_series_recursion(history):
+    expected = []
+    for series in history:
+        fits = []
+        for alpha in forecasting.SES_ALPHAS:
+            level, sse = series[0], 0.0
+            for value in series[1:]:
+                sse += (value - level) ** 2
+                level += alpha * (value - level)
+            fits.append((sse, level))
+        expected.append(min(fits, key=lambda fit: fit[0])[1])
+    np.testing.assert_allclose(forecasting.ses(history)[:, 0], expected)
+
+
+def test_predict_repeats_pattern_from_next_day():
+    pattern = np.array([[1.0, -2.0, 3.0]])
+    np.testing.assert_array_equal(forecasting.predict(pattern, 7), [[1, 0, 3, 1, 0, 3, 1]])
+
+
+def test_month_origins_are_first_days_with_room():
+    first = int(np.datetime64('2024-01-15', 'D').astype('int64'))
+    origins = forecasting.month_origins(first, 100, min_history=10, horizon=30)
+    dates = [np.datetime64(first + o, 'D') for o in origins]
+    assert [str(d) for d in dates] == ['2024-02-01', '2024-03-01']
+
+
+def test_backtest_sums_match_naive_errors(history):
+    origin, horizon = history.shape[1] - 14, 7
+    result = forecasting.backtest_origin(history, 'seasonal_naive', origin, horizon)
+    predicted = np.clip(history[:, origin - 7:origin], 0, None)
+    actual = history[:, origin:origin + horizon]
+    sold = actual > 0
+
+    assert result['abs_error'] == pytest.approx(np.abs(predicted - actual).sum())
+    assert result['error'] == pytest.approx((predicted - actual).sum())
+    assert result['actual'] == pytest.approx(actual.sum())
+    assert result['ape'] == pytest.approx((np.abs(predicted - actual)[sold] / actual[sold]).sum())
+    assert result['ape_count'] == sold.sum()
+
+
+def test_summary_adds_up_origins(history):
+    origins = [history.shape[1] - 28, history.shape[1] - 14]
+    results = forecasting.run_backtest(history, origins, 7)
+    summary = forecasting.summarize_backtest(results).set_index('Modèle')
+
+    assert set(summary.index) == set(forecasting.MODELS)
+    for model in forecasting.MODELS:
+        runs = [r for r in results if r['model'] == model]
+        actual = sum(r['actual'] for r in runs)
+        assert summary.loc[model, 'Origines'] == len(origins)
+        assert summary.loc[model, 'WAPE (%)'] == pytest.approx(round(sum(r['abs_error'] for r in runs) / actual * 100, 1))
+        assert summary.loc[model, 'Biais (%)'] == pytest.approx(round(sum(r['error'] for r in runs) / actual * 100, 1))
+
+
+def test_process_pool_matches_serial_run(history):
+    origins = [history.shape[1] - 28, history.shape[1] - 14]
+    serial = forecasting.run_backtest(history, origins, 7)
+    pooled = forecasting.run_backtest(history, origins, 7, workers=2)
+    key = ('model', 'abs_error', 'error', 'actual', 'ape', 'ape_count')
+    assert [tuple(r[k] for k in key) for r in pooled] == [tuple(r[k] for k in key) for r in serial]
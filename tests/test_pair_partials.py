@@ -0,0 +1,67 @@
+import pandas as pd
+import pytest
+
+import engine
+
+from conftest import naive_pairs
+
+CASES = [
+    {},
+    {'months': ['2024-01', '2024-02']},
+    {'months': ['2024-03']},
+    {'brands': ['NIKE']},
+    {'months': ['2024-02', '2024-03', '2024-04'], 'brands': ['ADIDAS']},
+    {'date_range': (pd.Timestamp('2024-01-10'), pd.Timestamp('2024-03-20'))},
+    {'months': ['2024-02'], 'brands': ['NIKE'], 'date_range': (pd.Timestamp('2024-02-05'), pd.Timestamp('2024-02-25'))},
+]
+
+
+@pytest.fixture
+def indexed(lines):
+    df, index = engine.build_filter_index(lines)
+    return df, index, engine.build_pair_partials(df, index)
+
+
+@pytest.mark.parametrize('filters', CASES)
+def test_combined_partitions_match_filtered_lines(indexed, filters):
+    df, index, partials = indexed
+    pairs, items, baskets = engine.combine_pair_partials(partials, **filters)
+    expected_pairs, expected_items, expected_baskets = naive_pairs(engine.filter_rows(df, index, **filters))
+
+    labels = partials['labels']
+    assert {(labels[r], labels[c]): v for r, c, v in zip(pairs.row, pairs.col, pairs.data)} == expected_pairs
+    assert {labels[i]: v for i, v in enumerate(items) if v} == expected_items
+    assert baskets == expected_baskets
+
+
+def test_partials_keep_orders_spanning_months(indexed):
+    _, _, partials = indexed
+    spanning = partials['spanning']
+    assert len(spanning)
+    assert (spanning.groupby('No Op', observed=True)['Mois'].nunique() > 1).all()
+
+
+def test_partials_support_threshold_filters_combined_counts(indexed):
+    df, index, partials = indexed
+    top, n = engine.assoc_from_partials(partials, 3.0, months=['2024-01', '2024-02'])
+    incidence, labels = engine.basket_incidence(
+        engine.filter_rows(df, index, months=['2024-01', '2024-02']).query('`Nbre Unités` > 0')[['No Op', 'Article']],
+        ['No Op']
+    )
+    expected, m = engine.top_pairs(engine.cooccurrence(incidence), labels, incidence.shape[0], 3.0, engine._item_counts(incidence))
+    assert n == m
+    pd.testing.assert_frame_equal(top, expected)
+
+
+@pytest.mark.parametrize('filters', CASES[1:])
+def test_neighbours_follow_the_filters(indexed, filters):
+    df, index, partials = indexed
+    got = engine.compute_neighbours(repr(filters), partials, **filters)
+
+    lines = engine.filter_rows(df, index, **filters).query('`Nbre Unités` > 0')[['No Op', 'Article']]
+    incidence, labels = engine.basket_incidence(lines, ['No Op'])
+    expected = engine.pair_neighbours(engine.cooccurrence(incidence), labels, engine._item_counts(incidence), incidence.shape[0])
+
+    assert list(got['products']) == list(expected['products'])
+    for product in expected['products']:
+        pd.testing.assert_frame_equal(engine.neighbours_of(got, product), engine.neighbours_of(expected, product))
@@ -0,0 +1,45 @@
+import engine
+from conftest import naive_pairs
+
+
+def _merged(lines):
+    parts = [engine.build_partials(part) for _, part in lines.groupby('_Source', observed=True)]
+    return engine.merge_partials(parts, lines)
+
+
+def test_fixture_has_spanning_orders(lines):
+    assert (lines.groupby('No Op', observed=True)['_Source'].nunique() > 1).any()
+
+
+def test_articles_match_whole_dataset(lines):
+    merged = _merged(lines)['articles']
+    expected = lines.groupby(['Article', 'Mois', 'Marque'], observed=True).agg(
+        units=('Nbre Unités', 'sum'), colis=('Nbre Colis', 'sum'), count=('Article', 'size')
+    )
+    merged = merged.set_index(['Article', 'Mois', 'Marque']).sort_index()
+    assert len(merged) == len(expected)
+    assert (merged['Nbre Unités'].to_numpy() == expected['units'].to_numpy()).all()
+    assert (merged['Nbre Colis'].to_numpy() == expected['colis'].to_numpy()).all()
+    assert (merged['Lignes'].to_numpy() == expected['count'].to_numpy()).all()
+
+
+def test_orders_spanning_partitions_are_whole(lines):
+    orders = _merged(lines)['orders'].set_index('No Op').sort_index()
+    expected = lines.groupby('No Op', observed=True).agg(
+        Date=('Date', 'min'), Lignes=('Article', 'count'), units=('Nbre Unités', 'sum')
+    ).sort_index()
+    assert orders.index.is_unique
+    assert list(orders.index.astype(str)) == list(expected.index.astype(str))
+    assert (orders['Date'].to_numpy() == expected['Date'].to_numpy()).all()
+    assert (orders['Lignes'].to_numpy() == expected['Lignes'].to_numpy()).all()
+    assert (orders['Nbre Unités'].to_numpy() == expected['units'].to_numpy()).all()
+
+
+def test_pairs_count_spanning_orders_once(lines):
+    merged = _merged(lines)
+    pairs, items, baskets = naive_pairs(lines)
+
+    got = {(a, b): f for a, b, f in merged['pairs'][['Produit A', 'Produit B', 'Fréquence']].itertuples(index=False)}
+    assert got == pairs
+    assert dict(zip(merged['items']['Article'], merged['items']['Paniers'])) == items
+    assert merged['baskets'] == baskets